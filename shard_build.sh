@@ -0,0 +1,13 @@
+# Builds the site as N shard processes sharing .build/shards, then merges
+# them into docs/, e.g.: bash shard_build.sh 4 "/site-generator/"
+N=${1:-2}
+shift
+pids=""
+for i in $(seq 1 "$N"); do
+    python3 src/main.py "$@" --shard "$i/$N" &
+    pids="$pids $!"
+done
+for pid in $pids; do
+    wait "$pid" || exit 1
+done
+python3 src/main.py "$@" --merge "$N"
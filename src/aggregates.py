@@ -0,0 +1,267 @@
+import os
+import re
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from html import escape
+
+from fileio import OutputWriter, hash_file
+from frontmatter import split_front_matter
+from generate_pages import page_props
+from htmlnode import LeafNode, ParentNode
+from manifest import json_digest
+from pageindex import PageIndex
+from template import Template
+from textnode import extract_title
+
+# Outputs that list other pages, built from a metadata index of the site:
+#
+#   sitemap.xml                     every page (needs the site's URL)
+#   feed.xml                        Atom feed of the newest posts under
+#                                   content/blog/ (needs the site's URL)
+#   blog/, blog/page/N/             the posts, newest first
+#   tags/, tags/<tag>/[page/N/]     the tags, and the pages of each tag
+#
+# Each page's title, date and tags (see frontmatter.py; the date defaults
+# to the source's mtime when it last changed) are kept in
+# .build/metadata.json with the digest of its source, so a build only
+# re-reads the sources that changed. An aggregate output is rendered again
+# only when the entries it lists change.
+
+METADATA_FORMAT = 1
+PAGE_SIZE = 20
+FEED_SIZE = 20
+# the most URLs one sitemap file may hold; larger sites get a sitemap index
+SITEMAP_SIZE = 50000
+BLOG_URL = "/blog"
+TAGS_URL = "/tags"
+
+
+def parse_date(value):
+    # ISO 8601 date or date-time -> RFC 3339 timestamp, in UTC if no zone
+    date = datetime.fromisoformat(value)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.isoformat()
+
+
+def parse_tags(value):
+    # "a, b" or "[a, b]" -> ["a", "b"]
+    value = value.strip().removeprefix("[").removesuffix("]")
+    tags = (tag.strip().strip("\"'") for tag in value.split(","))
+    return sorted({tag for tag in tags if tag})
+
+
+@lru_cache(maxsize=None)
+def tag_slug(tag):
+    return re.sub(r"[^\w]+", "-", tag.lower()).strip("-") or "-"
+
+
+def page_metadata(path, markdown):
+    # (title, date, tags) of a source, or None if it has no title (the page
+    # itself then fails to build, and says why)
+    fields, body = split_front_matter(markdown)
+    try:
+        title = extract_title(body)
+    except Exception:
+        return None
+    if "date" in fields:
+        try:
+            date = parse_date(fields["date"])
+        except ValueError:
+            raise Exception(f"{path}: invalid date {fields['date']!r}") from None
+    else:
+        mtime = os.stat(path).st_mtime
+        date = datetime.fromtimestamp(mtime, timezone.utc).replace(microsecond=0).isoformat()
+    return title, date, parse_tags(fields.get("tags", ""))
+
+
+class MetadataIndex(PageIndex):
+    # source path -> [digest, url, title, date, tags]
+    FORMAT = METADATA_FORMAT
+
+    def read_page(self, path, markdown):
+        return page_metadata(path, markdown)
+
+    def entries(self):
+        # [url, title, date, tags] of every page, newest first
+        entries = [entry[1:] for entry in self.pages.values()]
+        entries.sort(key=lambda entry: entry[0])
+        entries.sort(key=lambda entry: entry[2], reverse=True)
+        return entries
+
+
+def blog_posts(entries):
+    return [entry for entry in entries if entry[0].startswith(BLOG_URL + "/")]
+
+
+def absolute_url(site_url, url):
+    # page URLs end in "/", as the directory their index.html is served from
+    return site_url.rstrip("/") + (url if url.endswith("/") else url + "/")
+
+
+def render_sitemap(entries, site_url):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for url, _, date, _ in sorted(entries):
+        lines.append(f"  <url><loc>{escape(absolute_url(site_url, url))}</loc>"
+                     f"<lastmod>{date}</lastmod></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def render_sitemap_index(count, site_url):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for number in range(1, count + 1):
+        lines.append(f"  <sitemap><loc>{escape(site_url.rstrip('/'))}/sitemap-{number}.xml</loc></sitemap>")
+    lines.append("</sitemapindex>")
+    return "\n".join(lines) + "\n"
+
+
+def render_feed(posts, site_url, title):
+    home = absolute_url(site_url, "/")
+    updated = posts[0][2] if posts else datetime.fromtimestamp(0, timezone.utc).isoformat()
+    lines = ['<?xml version="1.0" encoding="utf-8"?>',
+             '<feed xmlns="http://www.w3.org/2005/Atom">',
+             f"  <title>{escape(title)}</title>",
+             f"  <id>{escape(home)}</id>",
+             f'  <link href="{escape(home)}"/>',
+             f'  <link rel="self" href="{escape(home)}feed.xml"/>',
+             f"  <updated>{updated}</updated>",
+             f"  <author><name>{escape(title)}</name></author>"]
+    for url, post_title, date, tags in posts[:FEED_SIZE]:
+        link = escape(absolute_url(site_url, url))
+        lines.append("  <entry>")
+        lines.append(f"    <title>{escape(post_title)}</title>")
+        lines.append(f"    <id>{link}</id>")
+        lines.append(f'    <link href="{link}"/>')
+        lines.append(f"    <updated>{date}</updated>")
+        for tag in tags:
+            lines.append(f'    <category term="{escape(tag)}"/>')
+        lines.append("  </entry>")
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+
+def listing_url(base, number):
+    return f"{base}/" if number == 1 else f"{base}/page/{number}/"
+
+
+def listing_pages(base, entries):
+    # (url, page number, page count, entries) for each page of a listing
+    count = -(-len(entries) // PAGE_SIZE)
+    return [
+        (listing_url(base, number), number, count, entries[(number - 1) * PAGE_SIZE:number * PAGE_SIZE])
+        for number in range(1, count + 1)
+    ]
+
+
+def listing_node(title, base, number, count, entries):
+    items = [
+        ParentNode("li", [
+            LeafNode("a", escape(entry_title), {"href": url}),
+            LeafNode(None, " "),
+            LeafNode("time", date[:10], {"datetime": date}),
+        ])
+        for url, entry_title, date, _ in entries
+    ]
+    children = [LeafNode("h1", escape(title)), ParentNode("ul", items)]
+    links = []
+    if number > 1:
+        links.append(LeafNode("a", "Newer", {"href": listing_url(base, number - 1), "rel": "prev"}))
+    if number < count:
+        links.append(LeafNode("a", "Older", {"href": listing_url(base, number + 1), "rel": "next"}))
+    if links:
+        children.append(ParentNode("nav", links))
+    return ParentNode("div", children)
+
+
+def tags_node(tags):
+    items = [
+        ParentNode("li", [
+            LeafNode("a", escape(tag), {"href": f"{TAGS_URL}/{slug}/"}),
+            LeafNode(None, f" ({len(entries)})"),
+        ])
+        for slug, (tag, entries) in sorted(tags.items())
+    ]
+    return ParentNode("div", [LeafNode("h1", "Tags"), ParentNode("ul", items)])
+
+
+def url_dest(dest_dir, url):
+    return os.path.join(dest_dir, *url.strip("/").split("/"), "index.html")
+
+
+def build_aggregates(pages, urls, dest_dir, index, template_path, basepath, manifest=None,
+                     site_url=None, listings=False, assets=None):
+    # Brings index up to date with pages, and writes sitemap.xml and
+    # feed.xml (given site_url) and the blog and tag listings (given
+    # listings) under dest_dir. urls maps each page's destination to its URL.
+    digest = manifest.digest if manifest is not None else hash_file
+    updated = index.update(pages, urls, digest)
+    entries = index.entries()
+    # output path -> (data it shows, function rendering it)
+    outputs = {}
+    if site_url:
+        home = [entry[1] for entry in entries if entry[0] == "/"]
+        site_title = home[0] if home else site_url
+        sitemaps = [entries[i:i + SITEMAP_SIZE] for i in range(0, len(entries), SITEMAP_SIZE)]
+        if len(sitemaps) > 1:
+            outputs[os.path.join(dest_dir, "sitemap.xml")] = (
+                [site_url, len(sitemaps)], partial(render_sitemap_index, len(sitemaps), site_url))
+            for number, part in enumerate(sitemaps, 1):
+                outputs[os.path.join(dest_dir, f"sitemap-{number}.xml")] = (
+                    [site_url, part], partial(render_sitemap, part, site_url))
+        else:
+            outputs[os.path.join(dest_dir, "sitemap.xml")] = (
+                [site_url, entries], partial(render_sitemap, entries, site_url))
+        posts = blog_posts(entries)[:FEED_SIZE]
+        outputs[os.path.join(dest_dir, "feed.xml")] = (
+            [site_url, site_title, posts], partial(render_feed, posts, site_url, site_title))
+    if listings:
+        with open(template_path, "r", encoding="utf-8") as f:
+            template = Template(f.read(), basepath, assets)
+        page_key = [template_path, digest(template_path), basepath, json_digest(assets) if assets else None]
+
+        def page(title, node, *args):
+            # renders node(*args) into the site template, when called
+            def render():
+                body = node(*args).iter_html(page_props(template))
+                return "".join(template.iter_render({"Title": escape(title), "Content": lambda: body}))
+            return render
+
+        lists = [("Blog", BLOG_URL, blog_posts(entries))]
+        # slug -> (tag as first spelled, entries), so "C++" and "c" or
+        # "Go" and "go" share a page rather than overwrite each other's
+        tags = {}
+        for entry in entries:
+            for tag in entry[3]:
+                tags.setdefault(tag_slug(tag), (tag, []))[1].append(entry)
+        for slug, (tag, tagged) in sorted(tags.items()):
+            lists.append((f"Tagged {tag}", f"{TAGS_URL}/{slug}", tagged))
+        if tags:
+            outputs[url_dest(dest_dir, TAGS_URL + "/")] = (
+                [page_key, sorted((slug, tag, len(tagged)) for slug, (tag, tagged) in tags.items())],
+                page("Tags", tags_node, tags))
+        for title, base, listed in lists:
+            if not listed:
+                continue
+            for url, number, count, shown in listing_pages(base, listed):
+                outputs[url_dest(dest_dir, url)] = (
+                    [page_key, title, number, count, shown],
+                    page(title, listing_node, title, base, number, count, shown))
+
+    rendered = 0
+    with OutputWriter() as writer:
+        for path, (data, render) in sorted(outputs.items()):
+            if path in urls:
+                print(f"Not generating {path}: content/ has a page there")
+                continue
+            inputs = {"aggregate": METADATA_FORMAT, "data": json_digest(data)}
+            if manifest is not None and manifest.is_current(path, inputs):
+                continue
+            writer.write(path, (render(),))
+            rendered += 1
+            if manifest is not None:
+                manifest.record(path, inputs)
+    print(f"Aggregates: {len(outputs)} outputs for {len(entries)} pages, {updated} pages read, "
+          f"{rendered} rendered, {writer.changed} changed on disk")
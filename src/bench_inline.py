@@ -0,0 +1,52 @@
+import sys
+import time
+
+from textnode import *
+
+# Compares the single-pass inline scanner against the original chain of
+# split_nodes_* passes on paragraphs with many links and images.
+#
+#   python3 src/bench_inline.py [links ...]
+
+def chained_text_to_text_nodes(text):
+    # the original pass-per-delimiter pipeline, kept as a reference (the
+    # inline scanner tests check text_to_text_nodes against it)
+    nodes = split_nodes_delimiter([TextNode(text, TextType.TEXT)], "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "__", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    return nodes
+
+def link_paragraph(links):
+    parts = []
+    for i in range(links):
+        if i % 5 == 4:
+            parts.append(f"an ![image {i}](/images/{i}.png)")
+        else:
+            parts.append(f"see **post {i}** at [the post](/blog/post-{i})")
+    return " ".join(parts)
+
+def best_of(func, text, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(sizes):
+    print(f"{'links':>6} {'chained ms':>11} {'scanner ms':>11} {'speedup':>8}")
+    for links in sizes:
+        text = link_paragraph(links)
+        if text_to_text_nodes(text) != chained_text_to_text_nodes(text):
+            raise Exception(f"scanner output differs from chained passes at {links} links")
+        chained = best_of(chained_text_to_text_nodes, text)
+        scanner = best_of(text_to_text_nodes, text)
+        print(f"{links:>6} {chained * 1000:>11.2f} {scanner * 1000:>11.2f} {chained / scanner:>7.1f}x")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 100, 500, 1000, 2000]
+    main(sizes)
@@ -0,0 +1,235 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from block import markdown_to_blocks, markdown_to_html_node
+from generate_pages import generate_page, generate_pages_recursive
+from textnode import text_to_text_nodes
+
+# Benchmarks for the markdown-to-HTML pipeline on synthetic corpora.
+#
+#   python3 src/benchmark.py [--scale N] [--pages N] [--output results.json]
+#   python3 src/benchmark.py --compare before.json
+#
+# Every result is the best of --repeat runs. Results can be written as JSON
+# and compared against an earlier run to spot regressions between commits.
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+def link_heavy(scale):
+    paragraphs = []
+    for p in range(scale):
+        links = " ".join(
+            f"see [post {p}-{i}](/blog/post-{i}) and ![image {i}](/images/{i}.png)"
+            for i in range(100)
+        )
+        paragraphs.append(links)
+    return "# Links\n\n" + "\n\n".join(paragraphs)
+
+
+def emphasis_heavy(scale):
+    line = "**bold** then _italic_ then __strong__ then *em* and `code` with **bold _inside_ bold** "
+    paragraphs = [line * 40 for _ in range(scale)]
+    return "# Emphasis\n\n" + "\n\n".join(paragraphs)
+
+
+def code_heavy(scale):
+    body = "\n".join(f"    value_{i} = compute({i}) * 2  # **not bold**" for i in range(500))
+    blocks = [f"```\n{body}\n```" for _ in range(scale)]
+    return "# Code\n\n" + "\n\n".join(blocks)
+
+
+def list_heavy(scale):
+    ulist = "\n".join(f"- item {i} with a [link](/item/{i}) and **bold**" for i in range(200))
+    olist = "\n".join(f"{i}. step {i} with _emphasis_" for i in range(1, 201))
+    return "# Lists\n\n" + "\n\n".join([ulist, olist] * scale)
+
+
+CORPORA = {
+    "links": link_heavy,
+    "emphasis": emphasis_heavy,
+    "code": code_heavy,
+    "lists": list_heavy,
+}
+
+
+def best_of(func, repeat, setup=None):
+    # setup runs untimed before each repeat
+    best = float("inf")
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def record(name, seconds, size=None, pages=None, peak=None):
+    result = {"name": name, "seconds": seconds}
+    if peak is not None:
+        result["peak_bytes"] = peak
+    if size is not None:
+        result["bytes"] = size
+        result["mb_per_s"] = size / seconds / 1e6 if seconds else None
+    if pages is not None:
+        result["pages"] = pages
+        result["pages_per_s"] = pages / seconds if seconds else None
+    return result
+
+
+def bench_corpus(name, markdown, repeat, tmp_dir):
+    size = len(markdown.encode("utf-8"))
+    blocks = markdown_to_blocks(markdown)
+    paragraphs = [b for b in blocks if not b.startswith(("#", "```", "- ", "1. "))]
+    node = markdown_to_html_node(markdown)
+
+    source = os.path.join(tmp_dir, f"{name}.md")
+    template = os.path.join(tmp_dir, "template.html")
+    dest = os.path.join(tmp_dir, name, "index.html")
+    with open(source, "w", encoding="utf-8") as f:
+        f.write(markdown)
+
+    inline_size = sum(len(p.encode("utf-8")) for p in paragraphs)
+    results = []
+    if paragraphs:
+        seconds = best_of(lambda: [text_to_text_nodes(p) for p in paragraphs], repeat)
+        results.append(record(f"{name}.text_to_text_nodes", seconds, inline_size))
+    results.append(record(f"{name}.markdown_to_blocks", best_of(lambda: markdown_to_blocks(markdown), repeat), size))
+    results.append(record(f"{name}.markdown_to_html_node", best_of(lambda: markdown_to_html_node(markdown), repeat), size,
+                          peak=peak_memory(lambda: markdown_to_html_node(markdown))))
+    results.append(record(f"{name}.to_html", best_of(node.to_html, repeat), size))
+    results.append(record(f"{name}.generate_page",
+                          best_of(lambda: generate_page(source, template, dest, "/base/"), repeat), size))
+    return results
+
+
+def make_site(root, pages):
+    size = 0
+    for i in range(pages):
+        markdown = (
+            f"# Post {i}\n\n"
+            f"Some **bold** text linking to [the previous post](/blog/post-{i - 1}) and `code`.\n\n"
+            + "- a list item with _emphasis_\n" * 10
+            + "\n```\nprint('hello')\n```\n\n"
+            + "A closing paragraph with ![an image](/images/x.png).\n"
+        )
+        path = os.path.join(root, "blog", f"post-{i}", "index.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(markdown)
+        size += len(markdown.encode("utf-8"))
+    return size
+
+
+def bench_site(pages, repeat, tmp_dir, jobs):
+    content = os.path.join(tmp_dir, "site-content")
+    template = os.path.join(tmp_dir, "template.html")
+    dest = os.path.join(tmp_dir, "site-docs")
+    size = make_site(content, pages)
+    # every repeat builds into an empty dest; into the last one's output,
+    # identical pages would not be written at all
+    seconds = best_of(lambda: generate_pages_recursive(content, template, dest, "/base/", jobs=jobs), repeat,
+                      setup=lambda: shutil.rmtree(dest, ignore_errors=True))
+    return [record(f"site.build.jobs{jobs}", seconds, size, pages)]
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def run(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(os.path.join(tmp_dir, "template.html"), "w", encoding="utf-8") as f:
+            f.write(TEMPLATE)
+        for name, make in CORPORA.items():
+            if args.only and name not in args.only:
+                continue
+            results.extend(bench_corpus(name, make(args.scale), args.repeat, tmp_dir))
+        if args.pages and (not args.only or "site" in args.only):
+            results.extend(bench_site(args.pages, args.repeat, tmp_dir, args.jobs))
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "results": results,
+    }
+
+
+def print_report(report, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {r["name"]: r for r in baseline["results"]}
+    print(f"{'benchmark':<36} {'ms':>10} {'MB/s':>9} {'pages/s':>9} {'peak KB':>9} {'vs base':>8}")
+    for r in report["results"]:
+        mbps = f"{r['mb_per_s']:.2f}" if r.get("mb_per_s") else ""
+        pps = f"{r['pages_per_s']:.0f}" if r.get("pages_per_s") else ""
+        peak = f"{r['peak_bytes'] / 1024:.0f}" if r.get("peak_bytes") else ""
+        change = ""
+        if r["name"] in previous and r["seconds"]:
+            change = f"{previous[r['name']]['seconds'] / r['seconds']:.2f}x"
+        print(f"{r['name']:<36} {r['seconds'] * 1000:>10.2f} {mbps:>9} {pps:>9} {peak:>9} {change:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the markdown-to-HTML pipeline.")
+    parser.add_argument("--scale", type=int, default=20, help="size multiplier for the corpora")
+    parser.add_argument("--pages", type=int, default=1000, help="pages in the synthetic site (0 skips it)")
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for the site build")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help=f"subset of: {', '.join(CORPORA)}, site")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    # generate_page and the site build log every page; keep the report readable
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            report = run(args)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
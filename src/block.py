@@ -1,8 +1,13 @@
 from enum import Enum
+from highlight import fence_language, highlight
 from htmlnode import *
 from textnode import *
+import profiling
 import re
 
+# Bump whenever a parser change alters the node tree a document produces, so
+# that cached parses from an older parser are not reused.
+PARSER_VERSION = "3"
 
 class BlockType(Enum):
     PARAGRAPH = "paragraph"
@@ -12,9 +17,11 @@ class BlockType(Enum):
     OLIST = "ordered_list"  
     ULIST = "unordered_list"  
 
+HEADING_PREFIXES = ("# ", "## ", "### ", "#### ", "##### ", "###### ")
+
 def block_to_block_type(block):
     lines = [line.strip() for line in block.split('\n')]
-    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
+    if block.startswith(HEADING_PREFIXES):
         return BlockType.HEADING
     if len(lines) > 1 and lines[0].startswith("```") and lines[-1].startswith("```"):
         return BlockType.CODE
@@ -32,13 +39,59 @@ def block_to_block_type(block):
     else:
         return BlockType.PARAGRAPH
     
+def _finish_block(lines, fenced, quote, ulist, olist):
+    block = "\n".join(lines).strip()
+    last = lines[-1].strip()
+    if block.startswith(HEADING_PREFIXES):
+        return BlockType.HEADING, block
+    if fenced and len(lines) > 1 and last.startswith("```"):
+        return BlockType.CODE, block
+    if quote:
+        return BlockType.QUOTE, block
+    if ulist:
+        return BlockType.ULIST, block
+    if olist:
+        return BlockType.OLIST, block
+    return BlockType.PARAGRAPH, block
+
+def iter_blocks(lines):
+    # Reads markdown line by line (a list, a str.split("\n") or an open file)
+    # and yields (BlockType, block) as each block ends, so a document never
+    # has to be held in memory whole. Blocks are separated by blank lines,
+    # except inside a ``` fence, which runs until its closing fence. The
+    # block type is worked out from the lines as they are read, with the same
+    # rules as block_to_block_type.
+    block = []
+    fenced = False
+    quote = ulist = olist = True
+    for line in lines:
+        line = line.rstrip("\r\n")
+        stripped = line.strip()
+        if fenced:
+            block.append(line)
+            if stripped.startswith("```"):
+                yield _finish_block(block, fenced, False, False, False)
+                block = []
+                fenced = False
+                quote = ulist = olist = True
+            continue
+        if not stripped:
+            if block:
+                yield _finish_block(block, fenced, quote, ulist, olist)
+                block = []
+                quote = ulist = olist = True
+            continue
+        if not block and stripped.startswith("```"):
+            fenced = True
+        quote = quote and stripped.startswith(">")
+        ulist = ulist and stripped.startswith("- ")
+        olist = olist and stripped.startswith(f"{len(block) + 1}. ")
+        block.append(line)
+    if block:
+        yield _finish_block(block, fenced, quote, ulist, olist)
+
 def markdown_to_blocks(markdown):
-    stripped_blocks = [line.strip() for line  in markdown.split('\n\n')]
-    blocks = []
-    for block in stripped_blocks:
-        if block:
-            blocks.append(block)
-    return blocks
+    return [block for _, block in iter_blocks(markdown.split("\n"))]
 
 def block_to_text(block, block_type):
     if block_type == BlockType.HEADING:
@@ -90,13 +143,17 @@ def block_to_text(block, block_type):
         return " ".join(non_empty)
 
 def text_to_children(text):
-    text_node_list = text_to_text_nodes(text)
-    children_list = []
-    for node in text_node_list:
-        html_node = text_node_to_html_node(node)
-        children_list.append(html_node)
+    with profiling.stage("inline"):
+        text_node_list = text_to_text_nodes(text)
+        children_list = []
+        for node in text_node_list:
+            html_node = text_node_to_html_node(node)
+            children_list.append(html_node)
     return children_list
 
+# one shared string per heading level instead of a new f"h{n}" per heading
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
 def heading_counter(block):
     count = 0
     for char in block:
@@ -107,39 +164,55 @@ def heading_counter(block):
     return count
 
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    children_nodes = []
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        text = block_to_text(block, block_type)
-        if block_type == BlockType.PARAGRAPH:
-            children = text_to_children(text)
-            node = ParentNode("p", children=children)
-        elif block_type == BlockType.HEADING:
-            children = text_to_children(text)
-            node = ParentNode(tag=f"h{heading_counter(block)}",children=children)
-        elif block_type == BlockType.QUOTE:
-            children = text_to_children(text)
-            node = ParentNode(tag="blockquote",children=children)
-        elif block_type == BlockType.ULIST:
-            list_item_nodes = []
-            for item_string in text:
-                item_children = text_to_children(item_string)
-                node = ParentNode(tag="li", children=item_children)
-                list_item_nodes.append(node)
-            node = ParentNode(tag="ul", children=list_item_nodes)
-        elif block_type == BlockType.OLIST:
-            list_item_nodes = []
-            for item_string in text:
-                item_children = text_to_children(item_string)
-                node = ParentNode(tag="li", children=item_children)
-                list_item_nodes.append(node)
-            node = ParentNode(tag="ol", children=list_item_nodes)
-        elif block_type == BlockType.CODE:
+def block_to_html_node(block, block_type):
+    text = block_to_text(block, block_type)
+    if block_type == BlockType.PARAGRAPH:
+        children = text_to_children(text)
+        node = ParentNode("p", children=children)
+    elif block_type == BlockType.HEADING:
+        children = text_to_children(text)
+        node = ParentNode(tag=HEADING_TAGS[heading_counter(block) - 1],children=children)
+    elif block_type == BlockType.QUOTE:
+        children = text_to_children(text)
+        node = ParentNode(tag="blockquote",children=children)
+    elif block_type == BlockType.ULIST:
+        list_item_nodes = []
+        for item_string in text:
+            item_children = text_to_children(item_string)
+            node = ParentNode(tag="li", children=item_children)
+            list_item_nodes.append(node)
+        node = ParentNode(tag="ul", children=list_item_nodes)
+    elif block_type == BlockType.OLIST:
+        list_item_nodes = []
+        for item_string in text:
+            item_children = text_to_children(item_string)
+            node = ParentNode(tag="li", children=item_children)
+            list_item_nodes.append(node)
+        node = ParentNode(tag="ol", children=list_item_nodes)
+    elif block_type == BlockType.CODE:
+        lang = fence_language(block.split("\n", 1)[0])
+        if lang:
+            with profiling.stage("highlight"):
+                html = highlight(text, lang)
+            if html is None:
+                html = text
+            code_node = LeafNode("code", html, {"class": f"language-{lang}"})
+        else:
             text_node = TextNode(text=text, text_type=TextType.TEXT)
             code_node = LeafNode("code", text_node.text)
-            node = ParentNode("pre", [code_node])
-        children_nodes.append(node)
+        node = ParentNode("pre", [code_node])
+    return node
+
+def iter_html_nodes(lines):
+    # One node per block, built lazily from iter_blocks
+    for block_type, block in iter_blocks(lines):
+        yield block_to_html_node(block, block_type)
+
+def markdown_to_html_node(markdown):
+    with profiling.stage("blocks"):
+        blocks = list(iter_blocks(markdown.split("\n")))
+    children_nodes = []
+    for block_type, block in blocks:
+        children_nodes.append(block_to_html_node(block, block_type))
     parent_node = ParentNode("div", children=children_nodes)
-    return parent_node
\ No newline at end of file
+    return parent_node
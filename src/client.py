@@ -0,0 +1,77 @@
+import json
+import os
+import socket
+import sys
+import time
+
+# Thin client of the build daemon (src/daemon.py), for editor integrations
+# that build many times a day. It imports nothing from the generator, so
+# it starts in a fraction of the time of main.py; when no daemon is
+# running it falls back to building in-process.
+#
+#   python3 src/client.py [build args...] [--changed PATH ...] [--stop]
+
+SOCKET_PATH = os.path.join(".build", "daemon.sock")
+
+
+def parse_client_args(argv):
+    # (build args, changed paths, stop, socket path); argparse is left out,
+    # since importing it costs more than the rest of the client
+    build_args = []
+    changed = []
+    stop = False
+    socket_path = SOCKET_PATH
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--changed" and i + 1 < len(argv):
+            changed.append(argv[i + 1])
+            i += 1
+        elif arg == "--socket" and i + 1 < len(argv):
+            socket_path = argv[i + 1]
+            i += 1
+        elif arg == "--stop":
+            stop = True
+        else:
+            build_args.append(arg)
+        i += 1
+    return build_args, changed, stop, socket_path
+
+
+def request(socket_path, message):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    build_args, changed, stop, socket_path = parse_client_args(argv)
+    # absolute, as the daemon may run in another directory
+    changed = [os.path.abspath(path) for path in changed]
+    message = {"stop": True} if stop else {"argv": build_args, "changed": changed}
+    start = time.perf_counter()
+    try:
+        reply = request(socket_path, message)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if stop:
+            print("No build daemon is running")
+            return 0
+        print("No build daemon is running, building in-process", file=sys.stderr)
+        import main as build_main
+        build_main.main(build_args)
+        return 0
+    sys.stdout.write(reply.get("output", ""))
+    if not reply["ok"]:
+        print(reply.get("error", "build failed"), file=sys.stderr)
+        return 1
+    if not stop:
+        total = (time.perf_counter() - start) * 1000
+        print(f"Built by daemon in {reply['elapsed_ms']:.1f} ms ({total:.1f} ms round trip)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import gzip
+import importlib.util
+import os
+
+from fileio import OutputWriter, remove_temp_files
+
+# brotli is optional; without it only .gz files are written. It is imported
+# only once there is something to compress with it.
+HAVE_BROTLI = importlib.util.find_spec("brotli") is not None
+
+# Text outputs worth precompressing; images and fonts are compressed already
+COMPRESS_EXTENSIONS = (".html", ".css", ".js", ".mjs", ".json", ".xml", ".svg", ".txt", ".map")
+# below this size the headers and the request outweigh any saving
+MIN_SIZE = 256
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def available_formats():
+    return ("gzip", "br") if HAVE_BROTLI else ("gzip",)
+
+
+def compressed_path(path, fmt):
+    return path + (".gz" if fmt == "gzip" else ".br")
+
+
+def compress_data(data, fmt):
+    if fmt == "gzip":
+        # mtime=0 keeps the output reproducible
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+    import brotli
+    return brotli.compress(data, quality=BROTLI_QUALITY)
+
+
+def compress_file(path, formats, writer):
+    # Writes the requested siblings of path through writer, which leaves
+    # byte-identical ones alone, and returns [(format, original size,
+    # compressed size, changed)].
+    with open(path, "rb") as f:
+        data = f.read()
+    results = []
+    for fmt in formats:
+        compressed = compress_data(data, fmt)
+        changed = writer.write(compressed_path(path, fmt), (compressed,))
+        results.append((fmt, len(data), len(compressed), changed))
+    return results
+
+
+def _match_mtime(path, formats):
+    # gives the siblings the mtime of path, which is how an unmanaged build
+    # tells they are current
+    st = os.stat(path)
+    for fmt in formats:
+        out = compressed_path(path, fmt)
+        if os.stat(out).st_mtime_ns != st.st_mtime_ns:
+            os.utime(out, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _compress_batch(jobs):
+    # compress_file for each (path, formats), with one OutputWriter whose
+    # pending files are discarded if the batch fails or is interrupted
+    with OutputWriter() as writer:
+        results = [compress_file(path, formats, writer) for path, formats in jobs]
+    for path, formats in jobs:
+        _match_mtime(path, formats)
+    return results
+
+
+def find_compressible(root):
+    files = []
+    for dirpath, dirnames, names in os.walk(root):
+        dirnames.sort()
+        for name in sorted(names):
+            if not name.endswith(COMPRESS_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            if os.path.getsize(path) >= MIN_SIZE:
+                files.append(path)
+    return files
+
+
+def is_compressed(path, fmt):
+    try:
+        return os.stat(compressed_path(path, fmt)).st_mtime_ns == os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def precompress(root, manifest=None, jobs=1, formats=None):
+    # Writes .gz (and, with brotli installed, .br) siblings for the text
+    # files under root, skipping those whose siblings are current, and
+    # prints how many bytes they save. With a manifest, only the outputs of
+    # the current build get siblings: those of outputs about to be pruned
+    # are left unseen, so manifest.prune() removes them along with the file.
+    formats = formats or available_formats()
+    todo = []
+    inputs = {}
+    current = 0
+    for path in find_compressible(root):
+        if manifest is not None and path not in manifest.seen:
+            continue
+        stale = []
+        for fmt in formats:
+            out = compressed_path(path, fmt)
+            if manifest is not None:
+                inputs[out] = {"source": manifest.digest(path), "format": fmt}
+                fresh = manifest.is_current(out, inputs[out])
+            else:
+                fresh = is_compressed(path, fmt)
+            if fresh:
+                current += 1
+            else:
+                stale.append(fmt)
+        if stale:
+            todo.append((path, stale))
+
+    if jobs > 1 and len(todo) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(todo) // (jobs * 4))
+        batches = [todo[i:i + chunksize] for i in range(0, len(todo), chunksize)]
+        try:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = [result for batch in pool.map(_compress_batch, batches) for result in batch]
+        except BaseException:
+            # a worker that died leaves its pending files behind
+            remove_temp_files(compressed_path(path, fmt) for path, stale in todo for fmt in stale)
+            raise
+    else:
+        results = _compress_batch(todo)
+
+    totals = {fmt: [0, 0, 0] for fmt in formats}
+    changed = 0
+    for (path, _), file_results in zip(todo, results):
+        for fmt, size, compressed_size, file_changed in file_results:
+            totals[fmt][0] += 1
+            totals[fmt][1] += size
+            totals[fmt][2] += compressed_size
+            changed += file_changed
+            if manifest is not None:
+                out = compressed_path(path, fmt)
+                manifest.record(out, inputs[out], [path])
+
+    compressed = sum(count for count, _, _ in totals.values())
+    print(f"Compressed files: {compressed} compressed, {changed} changed on disk, {current} unchanged")
+    for fmt, (count, size, compressed_size) in totals.items():
+        if count:
+            saved = size - compressed_size
+            print(f"  {fmt:<5} {count} files, {size} -> {compressed_size} bytes "
+                  f"({saved} saved, {saved / size * 100:.1f}%)")
+    return totals
@@ -1,21 +1,154 @@
 import os
 import shutil
+import sys
 
-def copy_static(src, dst):
-    for name in os.listdir(src):
-        if ":" in name or name.endswith(":Zone.Identifier"):
-            continue 
-        src_path = os.path.join(src, name)
-        dst_path = os.path.join(dst, name)
-
-        if os.path.isfile(src_path):
-            # ensure parent dir exists (in case you call copy_static flexibly)
-            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-            shutil.copy(src_path, dst_path)
-            print(f"Copied file: {src_path} -> {dst_path}")
-        else:
-            # directory: create then recurse
-            if not os.path.exists(dst_path):
-                os.mkdir(dst_path)
-                print(f"Created dir: {dst_path}")
-            copy_static(src_path, dst_path)
\ No newline at end of file
+from depgraph import source_node
+from fileio import copy_file_range, hash_file, write_json
+from scan import scan_tree
+from shard import in_shard
+
+# How a changed file gets into dst:
+#   copy     - byte copy done by the kernel (copy_file_range, or sendfile
+#              inside shutil), keeping the source mtime
+#   reflink  - copy-on-write clone where the filesystem supports it
+#   hardlink - share the source's inode; edits to either side show in both
+#   auto     - reflink, falling back to copy
+COPY_MODES = ("auto", "copy", "reflink", "hardlink")
+
+# hex digits of the content hash put in fingerprinted names
+FINGERPRINT_LENGTH = 8
+
+# ioctl number of FICLONE from linux/fs.h
+FICLONE = 0x40049409
+
+def _reflink(src_path, dst_path):
+    import fcntl
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_path, dst_path)
+
+def transfer(src_path, dst_path, mode="auto"):
+    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+    # never write through an existing file: it may be a hard link to src
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    if mode == "hardlink":
+        try:
+            os.link(src_path, dst_path)
+            return
+        except OSError:
+            pass
+    if mode in ("auto", "reflink") and sys.platform.startswith("linux"):
+        try:
+            _reflink(src_path, dst_path)
+            return
+        except OSError:
+            pass
+    if hasattr(os, "copy_file_range"):
+        try:
+            copy_file_range(src_path, dst_path)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src_path, dst_path)
+
+def is_synced(src_path, dst_path, checksum=False):
+    # dst is current if it has the size and mtime transfer() gave it;
+    # with checksum, equal-sized files with different mtimes are compared
+    # by content before being copied again
+    try:
+        dst_st = os.stat(dst_path)
+    except FileNotFoundError:
+        return False
+    src_st = os.stat(src_path)
+    if src_st.st_size != dst_st.st_size:
+        return False
+    if src_st.st_mtime_ns == dst_st.st_mtime_ns:
+        return True
+    return checksum and hash_file(src_path) == hash_file(dst_path)
+
+def copy_file(src_path, dst_path, manifest=None, mode="auto"):
+    if manifest is not None:
+        inputs = {"source": manifest.digest(src_path)}
+        if manifest.is_current(dst_path, inputs):
+            return False
+    elif is_synced(src_path, dst_path):
+        return False
+    transfer(src_path, dst_path, mode)
+    if manifest is not None:
+        manifest.record(dst_path, inputs, [source_node(src_path)])
+    print(f"Copied file: {src_path} -> {dst_path}")
+    return True
+
+def fingerprint_path(path, digest):
+    # docs/index.css -> docs/index.3f9a1c20.css
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+def write_asset_manifest(path, assets):
+    # {"/index.css": "/index.3f9a1c20.css", ...} for tools outside the build
+    write_json(path, assets, indent=2, sort_keys=True)
+
+def find_static(src, dst, index=None):
+    # (source, destination) pairs for every file under src, leaving out
+    # alternate data streams copied over from Windows (a.png:Zone.Identifier)
+    return [
+        (src_path, os.path.join(dst, os.path.relpath(src_path, src)))
+        for src_path in scan_tree(src, index, skip=lambda name: ":" in name)
+    ]
+
+def copy_static(src, dst, manifest=None, mode="auto", checksum=False, delete=False, workers=None,
+                assets=None, shard=None):
+    # Syncs src into dst, transferring only files that changed. Freshness
+    # comes from the manifest when there is one, otherwise from comparing
+    # size and mtime. delete removes files under dst that are not in src, so
+    # only use it when dst holds nothing but static files; with a manifest
+    # the orphans of a shared dst are removed by manifest.prune() instead.
+    # Given an assets dict, files are written under content-hashed names and
+    # assets is filled with {url: fingerprinted url} for rewriting links.
+    files = find_static(src, dst, manifest.scan if manifest is not None else None)
+    if assets is not None:
+        fingerprinted = []
+        for src_path, dst_path in files:
+            digest = manifest.digest(src_path) if manifest is not None else hash_file(src_path)
+            hashed_path = fingerprint_path(dst_path, digest)
+            url = "/" + os.path.relpath(dst_path, dst).replace(os.sep, "/")
+            assets[url] = "/" + os.path.relpath(hashed_path, dst).replace(os.sep, "/")
+            fingerprinted.append((src_path, hashed_path))
+        files = fingerprinted
+    if shard is not None:
+        # every shard knows every asset's name, but copies only its own
+        files = [pair for pair in files if in_shard(pair[0], src, shard)]
+    stale = []
+    inputs = {}
+    for src_path, dst_path in files:
+        if manifest is not None:
+            inputs[dst_path] = {"source": manifest.digest(src_path)}
+            if not manifest.is_current(dst_path, inputs[dst_path]):
+                stale.append((src_path, dst_path))
+        elif not is_synced(src_path, dst_path, checksum):
+            stale.append((src_path, dst_path))
+
+    if len(stale) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda pair: transfer(*pair, mode), stale))
+    elif stale:
+        transfer(*stale[0], mode)
+    if manifest is not None:
+        for src_path, dst_path in stale:
+            manifest.record(dst_path, inputs[dst_path], [source_node(src_path)])
+
+    removed = 0
+    if delete and os.path.isdir(dst):
+        wanted = {os.path.normpath(dst_path) for _, dst_path in files}
+        for dirpath, _, names in os.walk(dst, topdown=False):
+            for name in names:
+                path = os.path.normpath(os.path.join(dirpath, name))
+                if path not in wanted:
+                    os.remove(path)
+                    removed += 1
+            if dirpath != dst and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+    print(f"Static files: {len(stale)} copied, {len(files) - len(stale)} unchanged, {removed} removed")
+    return stale
@@ -0,0 +1,122 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import socketserver
+import time
+
+from main import MANIFEST_PATH, parse_args
+from manifest import BuildManifest
+from serve import DevSite
+
+# Build daemon: a long-lived process that keeps the manifest (with its
+# directory index), parse cache, compiled template and imported modules
+# warm, and builds on request from src/client.py over a Unix socket.
+#
+#   python3 src/daemon.py &
+#   python3 src/client.py "/site-generator/"                  # full build
+#   python3 src/client.py --changed content/blog/tom/index.md   # one page
+#
+# Requests and replies are one line of JSON each:
+#   {"argv": [...build args], "changed": [paths]}  or  {"stop": true}
+# with the changed paths absolute, or relative to the daemon's directory
+#   {"ok": bool, "output": str, "error": str, "elapsed_ms": float}
+
+SOCKET_PATH = os.path.join(".build", "daemon.sock")
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class BuildDaemon:
+    def __init__(self):
+        self.site = None
+        self.built = False
+        self.manifest_stamp = None
+
+    def handle(self, request):
+        args = parse_args(request.get("argv", []))
+        if args.shard or args.merge:
+            raise Exception("the daemon builds docs/ only; run --shard and --merge with main.py")
+        if self.site is None:
+            self.site = DevSite(args)
+        elif _stamp(MANIFEST_PATH) != self.manifest_stamp:
+            # another process built the site since; start from its manifest
+            self.site.manifest = BuildManifest.load(MANIFEST_PATH)
+            self.built = False
+        if self.built and args != self.site.args:
+            self.built = False
+        self.site.args = args
+        changed = request.get("changed")
+        if changed and self.built:
+            # DevSite compares paths relative to the site root, which the
+            # client may have spelled "./content/..." or absolutely
+            self.site.rebuild({os.path.relpath(os.path.abspath(path)) for path in changed})
+        else:
+            self.site.build()
+            self.built = True
+        self.manifest_stamp = _stamp(MANIFEST_PATH)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        if request.get("stop"):
+            self._reply({"ok": True, "output": "", "elapsed_ms": 0.0})
+            self.server.stopping = True
+            return
+        start = time.perf_counter()
+        output = io.StringIO()
+        reply = {"ok": True}
+        try:
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+                self.server.daemon.handle(request)
+        except SystemExit as e:
+            # argparse rejected the arguments, and said why in output
+            reply = {"ok": False, "error": f"invalid build arguments (exit status {e.code})"}
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        reply["output"] = output.getvalue()
+        reply["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        self._reply(reply)
+
+    def _reply(self, reply):
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+def serve(path=SOCKET_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        os.remove(path)
+    # requests are handled one at a time, since builds share all their state
+    with socketserver.UnixStreamServer(path, _Handler) as server:
+        server.daemon = BuildDaemon()
+        server.stopping = False
+        print(f"Build daemon listening on {path}")
+        try:
+            while not server.stopping:
+                server.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep a warm build process for src/client.py.")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    args = parser.parse_args(argv)
+    serve(args.socket)
+
+
+if __name__ == "__main__":
+    main()
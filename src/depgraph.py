@@ -0,0 +1,81 @@
+import posixpath
+from urllib.parse import urlsplit
+
+# Dependency graph of a build. Each output maps to the nodes it was built
+# from:
+#   source:<path>    the markdown file or static asset it comes from
+#   template:<path>  the page template
+#   page:<url>       a site page it links to; this node changes when a page
+#                    at that URL appears or disappears
+#   asset:<url>      a static file it shows (an image, with its size hints
+#                    and srcset, or with --fingerprint any URL it references,
+#                    by its name); this node changes with what is shown of it
+# Outputs can be inputs of other outputs, so a change invalidates the
+# transitive set of outputs that depend on it.
+
+
+def source_node(path):
+    return f"source:{path}"
+
+
+def template_node(path):
+    return f"template:{path}"
+
+
+def page_node(url):
+    return f"page:{url}"
+
+
+def asset_node(url):
+    return f"asset:{url}"
+
+
+def asset_urls(nodes):
+    # the URLs of the asset nodes among nodes
+    return [node[len("asset:"):] for node in nodes if node.startswith("asset:")]
+
+
+def normalize_url(url):
+    # Site-relative URL of a link target, or None for external links:
+    # "/blog/tom/#intro" -> "/blog/tom", "/" -> "/"
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith("/"):
+        return None
+    path = posixpath.normpath(parts.path)
+    if path.endswith("/index.html"):
+        path = path[: -len("/index.html")] or "/"
+    return path
+
+
+class DependencyGraph:
+    def __init__(self, edges=None):
+        # output -> sorted list of the nodes it depends on
+        self.edges = edges or {}
+        self._reverse = None
+
+    def set(self, output, inputs):
+        self.edges[output] = sorted(set(inputs))
+        self._reverse = None
+
+    def remove(self, output):
+        if self.edges.pop(output, None) is not None:
+            self._reverse = None
+
+    def dependents(self, node):
+        if self._reverse is None:
+            self._reverse = {}
+            for output, inputs in self.edges.items():
+                for node_ in inputs:
+                    self._reverse.setdefault(node_, []).append(output)
+        return self._reverse.get(node, [])
+
+    def affected(self, changed):
+        # every output reachable from the changed nodes
+        affected = set()
+        stack = list(changed)
+        while stack:
+            for output in self.dependents(stack.pop()):
+                if output not in affected:
+                    affected.add(output)
+                    stack.append(output)
+        return affected
@@ -0,0 +1,272 @@
+import contextlib
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import shutil
+import threading
+
+# Low-copy file I/O for large inputs: sources are memory-mapped and decoded
+# a line at a time, so a big document never exists as one str, and files
+# are copied by the kernel without passing through Python buffers. Outputs
+# go through OutputWriter, which leaves identical files untouched.
+
+# Outputs up to this size are compared with the file on disk in memory;
+# larger ones are streamed to their temporary file and compared by hash.
+MAX_BUFFERED = 4 * 1024 * 1024
+
+# How many changed files OutputWriter holds back before syncing them.
+FSYNC_BATCH = 64
+
+_temp_ids = itertools.count()
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def temp_path(path):
+    # a hidden name beside path, unique to this process and call, for a
+    # file that gets renamed onto path once it is whole
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{os.getpid()}-{next(_temp_ids)}.tmp")
+
+
+@contextlib.contextmanager
+def replacing(path):
+    # Yields a temporary path (see temp_path) to write path's new content
+    # to; it is renamed onto path when the block ends, or removed if the
+    # block raises, so readers and interrupted builds never see half a file.
+    tmp_path = temp_path(path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json(path, data, **options):
+    # Dumps data (with json.dump's options) to path atomically. Returns the
+    # size written.
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with replacing(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, **options)
+            size = f.tell()
+    return size
+
+
+@contextlib.contextmanager
+def map_file(path):
+    # Read-only mmap of path; b"" for an empty file, which cannot be mapped.
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+
+def iter_lines(buf, start=0, encoding="utf-8"):
+    # Decoded lines of a bytes-like buffer from offset start, each with its
+    # "\n". UTF-8 never uses the newline byte inside a multi-byte
+    # character, so every line decodes on its own.
+    pos = start
+    end = len(buf)
+    while pos < end:
+        newline = buf.find(b"\n", pos)
+        stop = end if newline == -1 else newline + 1
+        yield buf[pos:stop].decode(encoding)
+        pos = stop
+
+
+def head_text(buf, size=64 * 1024, encoding="utf-8"):
+    # The start of buf as text, dropping a character cut in half at size.
+    return bytes(buf[:size]).decode(encoding, errors="ignore")
+
+
+def copy_file_range(src_path, dst_path):
+    # Copies src to dst with os.copy_file_range, which keeps the data in the
+    # kernel (and lets filesystems such as NFS or btrfs copy server-side or
+    # share extents), then copies the metadata like shutil.copy2. Raises
+    # OSError where the call is not supported, e.g. across filesystems on
+    # older kernels; the caller falls back to shutil.
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copystat(src_path, dst_path)
+
+
+def _encoded(chunks):
+    for chunk in chunks:
+        yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+def _write_temp(path, chunks):
+    # (size, sha256) of the chunks written to path
+    h = hashlib.sha256()
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            h.update(chunk)
+            f.write(chunk)
+        return f.tell(), h.hexdigest()
+
+
+def _holds(path, size, data=None, digest=None):
+    # whether path already holds data (or, for large outputs, the bytes
+    # with this digest); the size is checked first, so most changed files
+    # are told apart without reading them
+    try:
+        if os.stat(path).st_size != size:
+            return False
+        if data is None:
+            return hash_file(path) == digest
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def _fsync(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class OutputWriter:
+    # Writes build outputs atomically, skipping the ones whose bytes have
+    # not changed, so their mtimes stay put for rsync and CDN syncs.
+    #
+    # A changed output is written to a temporary file beside it. With
+    # durable=True the renames are held back until flush() (which runs by
+    # itself every FSYNC_BATCH files): it fsyncs the pending files, renames
+    # them into place and fsyncs each of their directories once, instead of
+    # once per file. Safe to share between threads.
+    #
+    # Used as a context manager it flushes on leaving the block, or, when
+    # the block raises (a failed or interrupted build), discards the
+    # pending files so no temporary file is left in the output tree.
+    def __init__(self, durable=True, batch=FSYNC_BATCH):
+        self.durable = durable
+        self.batch = batch
+        self.changed = 0
+        self.unchanged = 0
+        # directory -> [(temporary path, destination)] awaiting flush()
+        self.pending = {}
+        self.pending_count = 0
+        self.lock = threading.Lock()
+
+    def write(self, path, chunks):
+        # Writes the str (as UTF-8) or bytes chunks to path, unless it
+        # already holds exactly those bytes; returns whether it changed.
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        chunks = _encoded(chunks)
+        parts = []
+        size = 0
+        for chunk in chunks:
+            parts.append(chunk)
+            size += len(chunk)
+            if size > MAX_BUFFERED:
+                break
+        data = b"".join(parts) if size <= MAX_BUFFERED else None
+        if data is not None and _holds(path, size, data):
+            return self._count(False)
+        tmp_path = temp_path(os.path.join(directory, os.path.basename(path)))
+        try:
+            if data is not None:
+                _write_temp(tmp_path, (data,))
+            else:
+                size, digest = _write_temp(tmp_path, itertools.chain(parts, chunks))
+                if _holds(path, size, digest=digest):
+                    os.remove(tmp_path)
+                    return self._count(False)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if not self.durable:
+            os.replace(tmp_path, path)
+            return self._count(True)
+        with self.lock:
+            self.pending.setdefault(directory, []).append((tmp_path, path))
+            self.pending_count += 1
+            full = self.pending_count >= self.batch
+        if full:
+            self.flush()
+        return self._count(True)
+
+    def _count(self, changed):
+        with self.lock:
+            if changed:
+                self.changed += 1
+            else:
+                self.unchanged += 1
+        return changed
+
+    def flush(self):
+        # puts every pending file in place, synced to disk
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.pending_count = 0
+        for directory, files in pending.items():
+            for tmp_path, _ in files:
+                _fsync(tmp_path)
+            for tmp_path, path in files:
+                os.replace(tmp_path, path)
+            # makes the renames themselves durable; not possible on Windows
+            if hasattr(os, "O_DIRECTORY"):
+                _fsync(directory)
+
+    def discard(self):
+        # removes every pending file, leaving the destinations as they were
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.pending_count = 0
+        for files in pending.values():
+            for tmp_path, _ in files:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.discard()
+
+
+def remove_temp_files(paths):
+    # Removes the temporary files an OutputWriter of any process left
+    # beside paths, e.g. one in a worker that was killed before flushing.
+    names = {}
+    for path in paths:
+        directory, name = os.path.split(os.path.abspath(path))
+        names.setdefault(directory, set()).add(name)
+    for directory, wanted in names.items():
+        try:
+            entries = os.listdir(directory)
+        except OSError:
+            continue
+        for entry in entries:
+            # .{name}.{pid}-{n}.tmp, see temp_path()
+            if entry.startswith(".") and entry.endswith(".tmp") and entry[1:].rsplit(".", 2)[0] in wanted:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(directory, entry))
@@ -0,0 +1,36 @@
+import re
+
+# Optional front matter: "key: value" lines between two "---" lines at the
+# very top of a source, read by aggregates.py and never rendered:
+#
+#   ---
+#   date: 2024-05-01
+#   tags: tolkien, reviews
+#   ---
+#   # Why Tom Bombadil Was a Mistake
+#
+# A source that opens with "---" followed by anything but such lines has no
+# front matter, and is left as it is.
+
+_FIELD_RE = re.compile(r"([A-Za-z][\w-]*)\s*:\s*(.*)")
+
+
+def split_front_matter(markdown):
+    # ({field: value}, the rest of the source), fields lower-cased
+    end = markdown.find("\n")
+    if end == -1 or markdown[:end].rstrip() != "---":
+        return {}, markdown
+    fields = {}
+    while True:
+        start = end + 1
+        end = markdown.find("\n", start)
+        line = (markdown[start:] if end == -1 else markdown[start:end]).rstrip()
+        if line == "---":
+            return fields, "" if end == -1 else markdown[end + 1:]
+        if end == -1:
+            return {}, markdown
+        if line:
+            match = _FIELD_RE.fullmatch(line)
+            if match is None:
+                return {}, markdown
+            fields[match.group(1).lower()] = match.group(2).strip()
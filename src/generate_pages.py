@@ -1,39 +1,405 @@
-from block import markdown_to_html_node
-from textnode import extract_title
+from block import PARSER_VERSION, iter_html_nodes, markdown_to_html_node
+from textnode import extract_markdown_links, extract_title
+from depgraph import asset_node, asset_urls, normalize_url, page_node, source_node, template_node
+from images import image_props
+from manifest import json_digest
+from template import Template, basepath_props, load_template, url_path
+from fileio import OutputWriter, head_text, iter_lines, map_file, remove_temp_files
+from frontmatter import split_front_matter
+from pipeline import run_pipeline
+from scan import scan_tree
+from shard import in_shard
 import os
+import profiling
 
-def generate_page(from_path, template_path, dest_path, basepath):
+def page_props(template, images=None, used=None):
+    # props_hook for a page body: size hints for known images, then
+    # basepath. A used set is filled with the static URLs the page shows
+    # (see static_key).
+    props_hook = basepath_props(template.basepath, template.assets)
+    if images:
+        props_hook = image_props(images, template.basepath, props_hook)
+    if used is not None:
+        if template.assets is not None:
+            # the template's stylesheets and scripts are shown by every page
+            used.update(template.urls)
+        props_hook = _url_collector(used, template.assets is not None, props_hook)
+    return props_hook
+
+def _url_collector(used, all_urls=False, hook=None):
+    # collects the root-relative src of images, or with all_urls (for
+    # fingerprinting) every root-relative href and src: one naming a static
+    # file that does not exist yet names an asset once it is added
+    def props_hook(tag, props):
+        if props:
+            for attr in ("href", "src") if all_urls else ("src",):
+                value = props.get(attr)
+                if (tag == "img" or all_urls) and isinstance(value, str) and value.startswith("/"):
+                    used.add(url_path(value))
+        return hook(tag, props) if hook is not None else props
+    return props_hook
+
+def static_key(urls, images=None, assets=None):
+    # Digest of what a page shows of the static files at the URLs it
+    # references (image size hints and srcset, fingerprinted names), or None
+    # if nothing: a page is rebuilt when the files it shows change, not when
+    # any file does.
+    urls = sorted(urls)
+    shown = {url: images[url] for url in urls if images and url in images}
+    names = {url: assets[url] for url in urls if assets and url in assets}
+    if not shown and not names:
+        return None
+    return json_digest({"images": shown, "assets": names})
+
+def iter_page(markdown, template, slots=None, cache=None, images=None, used=None):
+    # Parse up front so a bad document fails before anything is written,
+    # then hand back a generator that streams the compiled template with the
+    # page body, applying basepath to links and images as they go out.
+    _, markdown = split_front_matter(markdown)
+    if cache is not None:
+        node = cache.parse(markdown)
+    else:
+        node = markdown_to_html_node(markdown)
+    props_hook = page_props(template, images, used)
+    content = lambda: node.iter_html(props_hook)
+    if profiling.current() is not None:
+        # materialize the body so serialization is timed on its own
+        with profiling.stage("serialize"):
+            body = list(node.iter_html(props_hook))
+        content = lambda: body
+    values = {
+        "Title": extract_title(markdown),
+        "Content": content,
+    }
+    if slots:
+        values.update(slots)
+    return template.iter_render(values)
+
+# Sources larger than this are memory-mapped and converted block by block,
+# rather than read whole, and bypass the parse cache.
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+def iter_page_stream(buf, template, slots=None, images=None, links=None, used=None):
+    # Like iter_page, for the bytes of a source (usually a map_file mmap,
+    # which must stay open until the page is written): the title comes from
+    # the start of it, then the body is decoded, parsed and written one line
+    # and block at a time. A links set is filled with the URLs the page
+    # links to (see linked_pages) as the body goes by, and a used set as
+    # in iter_page.
+    head = head_text(buf)
+    _, body = split_front_matter(head)
+    start = len(head[:len(head) - len(body)].encode("utf-8"))
+    title = extract_title(body)
+    props_hook = page_props(template, images, used)
+
+    def content():
+        yield "<div>"
+        lines = iter_lines(buf, start)
+        if links is not None:
+            lines = _collect_links(lines, links)
+        for node in iter_html_nodes(lines):
+            yield from node.iter_html(props_hook)
+        yield "</div>"
+    values = {"Title": title, "Content": content}
+    if slots:
+        values.update(slots)
+    return template.iter_render(values)
+
+def _collect_links(lines, links):
+    # passes lines through, adding what they link to to links a paragraph
+    # (run of non-blank lines) at a time, as link text may span lines
+    paragraph = []
+    for line in lines:
+        yield line
+        if line.strip():
+            paragraph.append(line)
+        elif paragraph:
+            links.update(linked_pages("".join(paragraph)))
+            paragraph = []
+    links.update(linked_pages("".join(paragraph)))
+
+def render_page(markdown, template, slots=None):
+    return "".join(iter_page(markdown, template, slots))
+
+def write_page(dest_path, chunks, writer=None):
+    # True if the page changed; with a writer, it may only be in place
+    # once the writer is flushed
+    if writer is not None:
+        return writer.write(dest_path, chunks)
+    with OutputWriter() as writer:
+        return writer.write(dest_path, chunks)
+
+def generate_page(from_path, template_path, dest_path, basepath, slots=None, assets=None):
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
     abs_from_path = os.path.abspath(from_path)
-    abs_template_path = os.path.abspath(template_path)
     with open(abs_from_path, "r", encoding="utf-8") as f:
         markdown = f.read()
-    with open(abs_template_path, "r", encoding="utf-8") as f:
-        template = f.read()
-    node = markdown_to_html_node(markdown)
-    html = node.to_html()
-    title = extract_title(markdown)
-    placeholder_title = '{{ Title }}'
-    placeholder_content = '{{ Content }}'
-    content = template.replace(placeholder_title, title)
-    content = content.replace(placeholder_content, html)
-    content = content.replace('href="/',f'href="{basepath}')
-    content = content.replace('src="/', f'src="{basepath}')
-    abs_dest_path = os.path.abspath(dest_path)
-    os.makedirs(os.path.dirname(abs_dest_path), exist_ok=True)
-    with open(abs_dest_path, "w") as f:
-        f.write(content)
-
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    def walk(curr_dir):
-        for name in os.listdir(curr_dir):
-            path = os.path.join(curr_dir, name)
-            if os.path.isdir(path):
-                walk(path)
-            elif os.path.isfile(path) and name == "index.md":
-                rel_dir = os.path.relpath(curr_dir, start=dir_path_content)
-                des_dir = os.path.join(dest_dir_path, rel_dir)
-                os.makedirs(des_dir, exist_ok=True)
-                dest_html = os.path.join(des_dir, "index.html")
-                generate_page(path, template_path, dest_html, basepath)
-    walk(dir_path_content)
\ No newline at end of file
+    template = load_template(template_path, basepath, assets)
+    write_page(dest_path, iter_page(markdown, template, slots))
+
+def page_dest(from_path, dir_path_content, dest_dir_path):
+    rel_dir = os.path.relpath(os.path.dirname(from_path), start=dir_path_content)
+    des_dir = os.path.join(dest_dir_path, rel_dir)
+    return os.path.normpath(os.path.join(des_dir, "index.html"))
+
+def page_url(dest_path, dest_dir_path):
+    rel_dir = os.path.relpath(os.path.dirname(dest_path), start=dest_dir_path)
+    return "/" if rel_dir == "." else "/" + rel_dir.replace(os.sep, "/")
+
+def linked_pages(markdown):
+    # site-relative URLs this page links to
+    urls = set()
+    for _, url in extract_markdown_links(markdown):
+        url = normalize_url(url)
+        if url is not None:
+            urls.add(url)
+    return sorted(urls)
+
+def find_pages(dir_path_content, dest_dir_path, index=None):
+    # (source, destination) pairs in a stable order, so builds are
+    # reproducible whatever order the filesystem lists entries in
+    with profiling.stage("walk"):
+        return [
+            (path, page_dest(path, dir_path_content, dest_dir_path))
+            for path in scan_tree(dir_path_content, index)
+            if os.path.basename(path) == "index.md"
+        ]
+
+# Set once per worker process by _init_worker, so the template is read by
+# the parent and compiled by each worker once instead of once per page.
+_worker_template = None
+_worker_cache = None
+_worker_images = None
+_worker_writer = None
+
+def _init_worker(template, basepath, cache, profile=None, images=None, assets=None):
+    global _worker_template, _worker_cache, _worker_images, _worker_writer
+    # pool workers profile into a Profiler of their own and send the
+    # results back with each page; None leaves the process's state alone
+    if profile is True:
+        profiling.enable()
+    elif profile is False:
+        profiling.disable()
+    with profiling.stage("template"):
+        _worker_template = Template(template, basepath, assets)
+    _worker_cache = cache
+    _worker_images = images
+    _worker_writer = OutputWriter()
+
+def _build_page(page):
+    from_path, dest_path = page
+    error = None
+    links = []
+    used = set()
+    changed = False
+    with profiling.page(from_path):
+        try:
+            if os.path.getsize(from_path) > STREAM_THRESHOLD:
+                found = set()
+                with map_file(from_path) as buf:
+                    chunks = iter_page_stream(buf, _worker_template, images=_worker_images, links=found,
+                                              used=used)
+                    changed = write_page(dest_path, chunks, _worker_writer)
+                links = sorted(found)
+            else:
+                with profiling.stage("read"):
+                    with open(from_path, "r", encoding="utf-8") as f:
+                        markdown = f.read()
+                links = linked_pages(markdown)
+                chunks = iter_page(markdown, _worker_template, cache=_worker_cache,
+                                   images=_worker_images, used=used)
+                if profiling.current() is not None:
+                    with profiling.stage("substitute"):
+                        chunks = list(chunks)
+                with profiling.stage("write"):
+                    changed = write_page(dest_path, chunks, _worker_writer)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return error, _take_profile(), links, sorted(used), changed
+
+def _build_batch(pages):
+    # _build_page for each of pages, in a pool worker, with one flush of
+    # the worker's writer for all of them
+    try:
+        results = [_build_page(page) for page in pages]
+    except BaseException:
+        _worker_writer.discard()
+        raise
+    try:
+        _worker_writer.flush()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        results = [(result[0] or error,) + result[1:] for result in results]
+    return results
+
+def _read_source(page):
+    # None for sources large enough to be streamed by _render_source
+    from_path, _ = page
+    if os.path.getsize(from_path) > STREAM_THRESHOLD:
+        return None
+    with open(from_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _render_source(page, markdown):
+    # (html, linked URLs, static URLs, changed) for the writer stage;
+    # streamed pages are written here and now
+    from_path, dest_path = page
+    used = set()
+    if markdown is None:
+        found = set()
+        with map_file(from_path) as buf:
+            chunks = iter_page_stream(buf, _worker_template, images=_worker_images, links=found, used=used)
+            changed = write_page(dest_path, chunks, _worker_writer)
+        return None, sorted(found), sorted(used), changed
+    html = "".join(iter_page(markdown, _worker_template, cache=_worker_cache, images=_worker_images,
+                             used=used))
+    return html, linked_pages(markdown), sorted(used), False
+
+def _write_output(page, result):
+    html, _, _, changed = result
+    if html is not None:
+        changed = write_page(page[1], (html,), _worker_writer)
+    return changed
+
+def _build_pages_pipelined(pages):
+    # Same results as _build_page for each page, with reads and writes
+    # overlapping the rendering of other pages.
+    rendered = {}
+    written = {}
+    def render(page, markdown):
+        result = _render_source(page, markdown)
+        rendered[page] = result[1:3]
+        return result
+    def write(page, result):
+        written[page] = _write_output(page, result)
+    errors = run_pipeline(pages, _read_source, render, write)
+    return [
+        (None if error is None else f"{type(error).__name__}: {error}", None,
+         *rendered.get(page, ([], [])), written.get(page, False))
+        for page, error in zip(pages, errors)
+    ]
+
+def _take_profile():
+    profiler = profiling.current()
+    return profiler.take() if profiler is not None else None
+
+def build_pages(pages, template, basepath, jobs=1, cache=None, images=None, assets=None):
+    # Renders every (source, destination) pair and returns {source: error}
+    # for the pages that failed, {source: linked URLs} and {source: static
+    # URLs shown} for the others, and how many pages differ from what was
+    # on disk.
+    for from_path, dest_path in pages:
+        print(f"Generating page from {from_path} to {dest_path}")
+    try:
+        if jobs > 1 and len(pages) > 1:
+            # concurrent.futures (and, through it, multiprocessing) is
+            # imported only when needed: it is the largest part of startup
+            # time, which serial and no-op builds would otherwise pay for
+            from concurrent.futures import ProcessPoolExecutor
+            chunksize = max(1, len(pages) // (jobs * 8))
+            profile = profiling.current() is not None
+            # pages go to the workers in batches, each flushed (and
+            # fsynced) together
+            batches = [pages[i:i + chunksize] for i in range(0, len(pages), chunksize)]
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                     initargs=(template, basepath, cache, profile, images, assets)) as pool:
+                results = [result for batch in pool.map(_build_batch, batches) for result in batch]
+        else:
+            _init_worker(template, basepath, cache, images=images, assets=assets)
+            if profiling.current() is None and len(pages) > 1:
+                results = _build_pages_pipelined(pages)
+            else:
+                # profiled builds run page by page, so each stage is timed
+                # on its own and attributed to its page
+                results = [_build_page(page) for page in pages]
+            _worker_writer.flush()
+    except BaseException:
+        # interrupted, or a worker died: no page's temporary file may stay
+        # behind in the output tree
+        if _worker_writer is not None:
+            _worker_writer.discard()
+        remove_temp_files(dest_path for _, dest_path in pages)
+        raise
+    errors = {}
+    links = {}
+    urls = {}
+    changed = 0
+    profiler = profiling.current()
+    for (from_path, _), (error, profile_data, page_links, page_urls, page_changed) in zip(pages, results):
+        if error is not None:
+            errors[from_path] = error
+        else:
+            links[from_path] = page_links
+            urls[from_path] = page_urls
+            changed += page_changed
+        if profiler is not None and profile_data is not None:
+            profiler.merge(profile_data)
+    return errors, links, urls, changed
+
+def generate_pages(pages, template_path, basepath, manifest=None, jobs=1, cache=None, changed=(),
+                   images=None, assets=None):
+    # Builds the given (source, destination) pairs, skipping the ones the
+    # manifest says are current unless they depend on one of the changed
+    # dependency-graph nodes.
+    with profiling.stage("template"):
+        with open(template_path, "r", encoding="utf-8") as f:
+            template = f.read()
+
+    stale = []
+    inputs = {}
+    with profiling.stage("manifest"):
+        template_digest = manifest.digest(template_path) if manifest else None
+        affected = manifest.graph.affected(changed) if manifest and changed else set()
+        for from_path, dest_html in pages:
+            if manifest is None:
+                stale.append((from_path, dest_html))
+                continue
+            inputs[dest_html] = {
+                "source": manifest.digest(from_path),
+                "template": template_digest,
+                "basepath": basepath,
+                # parser changes alter the HTML of unchanged sources
+                "parser": PARSER_VERSION,
+            }
+            # the static files it showed last time; were it to show others
+            # now, its source or the template changed too
+            key = static_key(asset_urls(manifest.graph.edges.get(dest_html, ())), images, assets)
+            if key is not None:
+                inputs[dest_html]["static"] = key
+            current = manifest.is_current(dest_html, inputs[dest_html])
+            if not current or dest_html in affected:
+                stale.append((from_path, dest_html))
+
+    errors, links, urls, written = build_pages(stale, template, basepath, jobs, cache, images, assets)
+    if stale:
+        print(f"Pages: {len(stale)} generated, {written} changed on disk")
+    if manifest is not None:
+        for from_path, dest_html in stale:
+            if from_path not in errors:
+                key = static_key(urls[from_path], images, assets)
+                inputs[dest_html].pop("static", None)
+                if key is not None:
+                    inputs[dest_html]["static"] = key
+                deps = [source_node(from_path), template_node(template_path)]
+                deps.extend(page_node(url) for url in links[from_path])
+                deps.extend(asset_node(url) for url in urls[from_path])
+                manifest.record(dest_html, inputs[dest_html], deps)
+    if errors:
+        details = "\n".join(f"  {path}: {error}" for path, error in errors.items())
+        raise Exception(f"failed to generate {len(errors)} page(s):\n{details}")
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, manifest=None, jobs=1, cache=None,
+                             images=None, assets=None, shard=None):
+    # shard=(i, N) builds only the pages of shard i of N (see shard.py)
+    pages = find_pages(dir_path_content, dest_dir_path, manifest.scan if manifest is not None else None)
+    changed = set()
+    if manifest is not None:
+        # pages that appeared or disappeared invalidate the pages linking
+        # to them (a rename is both)
+        urls = {page_url(dest_html, dest_dir_path) for _, dest_html in pages}
+        changed = {page_node(url) for url in urls ^ manifest.page_urls}
+    if shard is not None:
+        pages = [page for page in pages if in_shard(page[0], dir_path_content, shard)]
+    generate_pages(pages, template_path, basepath, manifest, jobs, cache, changed, images, assets)
+    if manifest is not None:
+        manifest.page_urls = urls
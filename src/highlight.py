@@ -0,0 +1,148 @@
+import re
+from functools import lru_cache
+from html import escape
+
+# Dependency-free syntax highlighting for fenced code blocks. Each language
+# is one regex of named alternatives tried left to right; what a token
+# matches decides its CSS class (see the .tok-* rules in index.css), and
+# text between tokens is left plain. Only HTML-escaped text goes out.
+
+TOKEN_CLASSES = {
+    "comment": "tok-com",
+    "string": "tok-str",
+    "number": "tok-num",
+    "keyword": "tok-kw",
+    "builtin": "tok-bi",
+    "variable": "tok-var",
+}
+
+_C_COMMENT = r"//[^\n]*|/\*[\s\S]*?\*/"
+_HASH_COMMENT = r"#[^\n]*"
+_DQ_STRING = r'"(?:\\.|[^"\\\n])*"'
+_SQ_STRING = r"'(?:\\.|[^'\\\n])*'"
+_NUMBER = r"\b(?:0[xX][0-9a-fA-F_]+|0[bB][01_]+|0[oO][0-7_]+|\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?)\b"
+
+
+def _words(words):
+    return r"\b(?:" + "|".join(words.split()) + r")\b"
+
+
+_SPECS = {
+    "python": [
+        ("comment", _HASH_COMMENT),
+        ("string", r"(?i:[rbfu]{0,2})(?:\"\"\"[\s\S]*?\"\"\"|'''[\s\S]*?'''|" + _DQ_STRING + "|" + _SQ_STRING + ")"),
+        ("keyword", _words(
+            "and as assert async await break class continue def del elif else except False finally "
+            "for from global if import in is lambda None nonlocal not or pass raise return True try "
+            "while with yield match case")),
+        ("builtin", _words(
+            "print len range str int float bool dict list set tuple object type isinstance open "
+            "super enumerate zip map filter sorted min max sum any all self")),
+        ("number", _NUMBER),
+    ],
+    "javascript": [
+        ("comment", _C_COMMENT),
+        ("string", _DQ_STRING + "|" + _SQ_STRING + r"|`(?:\\.|[^`\\])*`"),
+        ("keyword", _words(
+            "async await break case catch class const continue debugger default delete do else "
+            "export extends false finally for function if import in instanceof let new null of "
+            "return static super switch this throw true try typeof undefined var void while yield "
+            "interface type enum implements")),
+        ("builtin", _words("console document window Array Object String Number Promise JSON Math Map Set")),
+        ("number", _NUMBER),
+    ],
+    "go": [
+        ("comment", _C_COMMENT),
+        ("string", _DQ_STRING + "|" + _SQ_STRING + r"|`[^`]*`"),
+        ("keyword", _words(
+            "break case chan const continue default defer else fallthrough for func go goto if "
+            "import interface map package range return select struct switch type var true false nil")),
+        ("builtin", _words(
+            "append cap close copy delete len make new panic print println recover "
+            "bool byte error float64 int int64 rune string uint")),
+        ("number", _NUMBER),
+    ],
+    "c": [
+        ("comment", _C_COMMENT),
+        ("string", _DQ_STRING + "|" + _SQ_STRING),
+        ("keyword", _words(
+            "auto break case char class const continue default delete do double else enum extern "
+            "false final float for fn if impl import int let long loop match mut namespace new "
+            "package private protected public pub return short signed sizeof static struct super "
+            "switch template this throw true try typedef union unsigned use using void volatile "
+            "while null nullptr")),
+        ("number", _NUMBER),
+    ],
+    "bash": [
+        ("comment", r"(?<![\w$])" + _HASH_COMMENT),
+        ("string", _DQ_STRING + r"|'[^']*'"),
+        ("variable", r"\$\{[^}\n]*\}|\$\w+|\$[@#?$!*-]"),
+        ("keyword", _words(
+            "if then else elif fi for while until do done case esac in function return local "
+            "export readonly set unset shift exit")),
+        ("builtin", _words("echo printf cd pwd read test source alias eval exec")),
+        ("number", _NUMBER),
+    ],
+    "json": [
+        ("string", _DQ_STRING),
+        ("keyword", _words("true false null")),
+        ("number", r"-?" + _NUMBER),
+    ],
+    "css": [
+        ("comment", r"/\*[\s\S]*?\*/"),
+        ("string", _DQ_STRING + "|" + _SQ_STRING),
+        ("number", r"#[0-9a-fA-F]{3,8}\b|-?\d*\.?\d+(?:px|em|rem|%|vh|vw|s|ms|deg)?\b"),
+        ("keyword", r"@[\w-]+|!important"),
+    ],
+}
+
+ALIASES = {
+    "py": "python", "python3": "python",
+    "js": "javascript", "jsx": "javascript", "ts": "javascript", "tsx": "javascript",
+    "typescript": "javascript", "node": "javascript",
+    "golang": "go",
+    "cpp": "c", "c++": "c", "h": "c", "java": "c", "rust": "c", "rs": "c", "cs": "c", "csharp": "c",
+    "sh": "bash", "shell": "bash", "zsh": "bash", "console": "bash",
+}
+
+
+@lru_cache(maxsize=None)
+def _compile(name):
+    # compiled on first use, so runs without code blocks do not pay for it
+    return re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _SPECS[name]))
+
+
+# what a language name may contain; it ends up in a class attribute, so
+# nothing that could close the attribute (a quote) or the tag gets through
+_LANGUAGE_RE = re.compile(r"[\w+#.-]+")
+
+
+def fence_language(line):
+    # "```python title=x" -> "python"; "" when the fence names none
+    match = _LANGUAGE_RE.match(line.strip().lstrip("`").strip())
+    return match.group().lower() if match else ""
+
+
+def language(name):
+    name = ALIASES.get(name, name)
+    return name if name in _SPECS else None
+
+
+@lru_cache(maxsize=1024)
+def highlight(code, lang):
+    # HTML for code in lang, or None if the language is not known. The
+    # same snippet repeated across pages is highlighted once per process.
+    name = language(lang)
+    if name is None:
+        return None
+    regex = _compile(name)
+    out = []
+    pos = 0
+    for match in regex.finditer(code):
+        if match.start() > pos:
+            out.append(escape(code[pos:match.start()], quote=False))
+        out.append(f'<span class="{TOKEN_CLASSES[match.lastgroup]}">'
+                   f"{escape(match.group(), quote=False)}</span>")
+        pos = match.end()
+    out.append(escape(code[pos:], quote=False))
+    return "".join(out)
@@ -1,4 +1,8 @@
 class HTMLNode:
+    # Pages are parsed into thousands of short-lived nodes, so they carry no
+    # per-instance __dict__. Nodes without attributes share props=None.
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -7,46 +11,96 @@ class HTMLNode:
     
     def to_html(self):
         raise NotImplementedError
+
+    def iter_html(self, props_hook=None):
+        # Yields the HTML in chunks instead of building one string per
+        # subtree, so a page can be streamed straight into a file.
+        # props_hook(tag, props) -> props lets the caller rewrite attributes
+        # (e.g. prefixing URLs with the basepath) as they are serialized.
+        yield self.to_html()
+
+    def write_to(self, fp, props_hook=None):
+        fp.writelines(self.iter_html(props_hook))
     
     def props_to_html(self):
-        parts = []
-        for key, value in self.props.items():
-            parts.append(f' {key}="{value}"')
-        return "".join(parts)
+        return props_to_html(self.props)
     
     def __repr__(self):
         return f"HTMLNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})"
     
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag=tag, children=children, props=props)
+        self.tag = tag
+        self.value = None
+        self.children = children
+        self.props = props
 
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def iter_html(self, props_hook=None):
         if self.tag is None:
             raise ValueError("No tag")
         if not self.children or self.children is None:
             raise ValueError("missing children")
         else:
-            middle = ""
+            yield f"<{self.tag}>"
             for child in self.children:
-                middle += f"{child.to_html()}"
-            start = f"<{self.tag}>"
-            end = f"</{self.tag}>"
-            final = start + middle + end
-            return final
+                yield from child.iter_html(props_hook)
+            yield f"</{self.tag}>"
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
-        super().__init__(tag=tag, value=value, props=props)
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props
     
     def to_html(self):
+        return self._render(self.props)
+
+    def iter_html(self, props_hook=None):
+        props = self.props
+        if props_hook is not None and self.tag is not None:
+            props = props_hook(self.tag, props)
+        yield self._render(props)
+
+    def _render(self, props):
         if self.value is None:
             raise ValueError
         if self.tag is None:
             return f"{self.value}"
         else:
-            props_string = self.props_to_html() if self.props else ""
+            props_string = props_to_html(props) if props else ""
             return f"<{self.tag}{props_string}>{self.value}</{self.tag}>"
 
 
+def props_to_html(props):
+    parts = []
+    for key, value in props.items():
+        parts.append(f' {key}="{value}"')
+    return "".join(parts)
+
+
+# Compact, JSON-friendly form of a node tree, used to cache parsed pages:
+# [tag, value] for leaves, [tag, [children...]] for parents, with the props
+# dict appended as a third item when there is one.
+def node_to_data(node):
+    if isinstance(node, ParentNode):
+        data = [node.tag, [node_to_data(child) for child in node.children]]
+    else:
+        data = [node.tag, node.value]
+    if node.props:
+        data.append(node.props)
+    return data
 
+def node_from_data(data):
+    tag, body = data[0], data[1]
+    props = data[2] if len(data) > 2 else None
+    if isinstance(body, list):
+        return ParentNode(tag, [node_from_data(child) for child in body], props)
+    return LeafNode(tag, body, props)
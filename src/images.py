@@ -0,0 +1,200 @@
+import importlib.util
+import os
+import struct
+
+from copystatic import find_static, fingerprint_path, transfer
+from depgraph import source_node
+from fileio import hash_file, replacing
+from manifest import json_digest
+from shard import in_shard
+
+# Pillow is optional: without it images keep only their width and height
+# hints (read from the PNG header), and no variants are made. It is looked
+# up without being imported, and imported only by the functions using it,
+# so builds (and workers) that never open an image do not pay for it.
+HAVE_PILLOW = importlib.util.find_spec("PIL") is not None
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+# srcset widths, used where they are smaller than the original
+SRCSET_WIDTHS = (480, 960, 1440)
+WEBP_QUALITY = 80
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def png_size(path):
+    # (width, height) from the IHDR chunk, which a PNG must start with
+    with open(path, "rb") as f:
+        head = f.read(24)
+    if len(head) < 24 or head[:8] != _PNG_SIGNATURE or head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def image_size(path):
+    if path.lower().endswith(".png"):
+        size = png_size(path)
+        if size is not None:
+            return size
+    if not HAVE_PILLOW:
+        return None
+    from PIL import Image
+    try:
+        with Image.open(path) as im:
+            return im.size
+    except OSError:
+        return None
+
+
+def cached_image_size(path, digest, manifest=None):
+    # image_size, remembered in the manifest against the image's digest
+    if manifest is None:
+        return image_size(path)
+    cached = manifest.image_sizes.get(path)
+    if cached is not None and cached[0] == digest:
+        return tuple(cached[1]) if cached[1] is not None else None
+    size = image_size(path)
+    manifest.image_sizes[path] = [digest, list(size) if size is not None else None]
+    return size
+
+
+def variant_widths(width, widths=SRCSET_WIDTHS):
+    # the srcset widths below the original's, then the original width
+    return [w for w in widths if w < width] + [width]
+
+
+def variant_path(path, width):
+    # static/images/tom.png -> static/images/tom-480w.webp
+    return f"{os.path.splitext(path)[0]}-{width}w.webp"
+
+
+def cache_path(cache_dir, digest, width):
+    return os.path.join(cache_dir, digest[:2], f"{digest}-{width}w-q{WEBP_QUALITY}.webp")
+
+
+def _make_variants(src_path, digest, cache_dir, widths):
+    # Writes the WebP variants of one image into the cache, leaving those an
+    # earlier build already made, and returns their paths.
+    paths = [cache_path(cache_dir, digest, w) for w in widths]
+    todo = [(w, path) for w, path in zip(widths, paths) if not os.path.exists(path)]
+    if not todo:
+        return paths
+    from PIL import Image
+    with Image.open(src_path) as im:
+        im.load()
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA")
+        for w, path in todo:
+            h = max(1, round(im.height * w / im.width))
+            resized = im if w == im.width else im.resize((w, h), Image.LANCZOS)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # renamed into place, so an interrupted build leaves no partial
+            # entry behind
+            with replacing(path) as tmp_path:
+                resized.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=6)
+    return paths
+
+
+def _make_variants_job(job):
+    return _make_variants(*job)
+
+
+def process_images(src, dst, cache_dir, manifest=None, jobs=1, widths=SRCSET_WIDTHS, shard=None,
+                   assets=None):
+    # Finds the images under src and, with Pillow, puts resized WebP variants
+    # of each next to its copy in dst. Variants are made once per distinct
+    # source (by hash) and kept in cache_dir, so later builds only copy them.
+    # Returns {url: {"width", "height", "srcset": [[url, width], ...]}} for
+    # image_props. With a shard, the table still covers every image, but
+    # only the shard's own images get their variants written. Given the
+    # assets dict of copy_static, variants get fingerprinted names too.
+    images = {}
+    jobs_todo = []
+    outputs = []
+    for src_path, dst_path in find_static(src, dst, manifest.scan if manifest is not None else None):
+        if not src_path.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        # by the manifest's size/mtime fast path, an unchanged image is not
+        # read at all
+        digest = manifest.digest(src_path) if manifest is not None else None
+        size = cached_image_size(src_path, digest, manifest)
+        if size is None:
+            continue
+        width, height = size
+        url = "/" + os.path.relpath(src_path, src).replace(os.sep, "/")
+        info = {"width": width, "height": height, "srcset": []}
+        images[url] = info
+        if not HAVE_PILLOW:
+            continue
+
+        variants = variant_widths(width, widths)
+        mine = in_shard(src_path, src, shard)
+        if digest is None and (mine or assets is not None):
+            digest = hash_file(src_path)
+        stale = False
+        for w in variants:
+            url_w, dest = variant_path(url, w), variant_path(dst_path, w)
+            inputs = {"source": digest, "width": w, "quality": WEBP_QUALITY}
+            if assets is not None:
+                # named after what it is made from, which fixes its content,
+                # so every shard knows the name without making it
+                fingerprint = json_digest(inputs)
+                assets[url_w] = fingerprint_path(url_w, fingerprint)
+                url_w, dest = assets[url_w], fingerprint_path(dest, fingerprint)
+            info["srcset"].append([url_w, w])
+            if not mine:
+                continue
+            if manifest is not None:
+                current = manifest.is_current(dest, inputs)
+            else:
+                current = os.path.exists(dest)
+            if not current:
+                stale = True
+            outputs.append((src_path, dest, inputs))
+        if stale:
+            jobs_todo.append((src_path, digest, cache_dir, variants))
+
+    if jobs > 1 and len(jobs_todo) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            made = list(pool.map(_make_variants_job, jobs_todo))
+    else:
+        made = [_make_variants(*job) for job in jobs_todo]
+
+    cached = {}
+    for (src_path, _, _, variants), paths in zip(jobs_todo, made):
+        for w, path in zip(variants, paths):
+            cached[(src_path, w)] = path
+    written = 0
+    for src_path, dest, inputs in outputs:
+        path = cached.get((src_path, inputs["width"]))
+        if path is None:
+            continue
+        transfer(path, dest, "auto")
+        written += 1
+        if manifest is not None:
+            manifest.record(dest, inputs, [source_node(src_path)])
+    if not HAVE_PILLOW:
+        print(f"Images: {len(images)} sized (install Pillow for srcset variants)")
+    else:
+        print(f"Images: {len(images)} sized, {written} variants written, "
+              f"{len(outputs) - written} unchanged")
+    return images
+
+
+def image_props(images, basepath="/", hook=None):
+    # props_hook giving <img> tags of processed images their width, height
+    # and srcset, then applying hook (the basepath rewrite) on top.
+    def props_hook(tag, props):
+        if tag == "img" and props:
+            info = images.get(props.get("src"))
+            if info is not None:
+                props = dict(props)
+                props["width"] = str(info["width"])
+                props["height"] = str(info["height"])
+                if info["srcset"]:
+                    props["srcset"] = ", ".join(
+                        f"{basepath}{url[1:]} {w}w" for url, w in info["srcset"]
+                    )
+        return hook(tag, props) if hook is not None else props
+    return props_hook
@@ -1,26 +1,177 @@
+import argparse
 import os
-import shutil
-from copystatic import copy_static
-import sys
-from generate_pages import generate_pages_recursive
-
-if len(sys.argv) < 2:
-    basepath = "/"
-else:
-    basepath = sys.argv[1]
-
-def main():
-    src = "static"
-    dst = "docs"
-    
-    # clean destination
-    if os.path.exists(dst):
-        shutil.rmtree(dst)
-    os.mkdir(dst)
-
-    copy_static(src, dst)
-    print("Static assets copied.")
-    generate_pages_recursive("content", "template.html", "docs", basepath)
+import profiling
+from aggregates import MetadataIndex, build_aggregates
+from compress import precompress
+from copystatic import COPY_MODES, copy_static, write_asset_manifest
+from generate_pages import find_pages, generate_pages_recursive, page_url
+from images import process_images
+from manifest import BuildManifest
+from parse_cache import ParseCache
+from search import SearchIndex, build_search_index
+from shard import merge_shards, parse_shard, shard_assets_path, shard_paths
+
+STATIC_DIR = "static"
+CONTENT_DIR = "content"
+TEMPLATE_PATH = "template.html"
+OUTPUT_DIR = "docs"
+MANIFEST_PATH = os.path.join(".build", "manifest.json")
+PARSE_CACHE_DIR = os.path.join(".build", "parsed")
+IMAGE_CACHE_DIR = os.path.join(".build", "images")
+ASSET_MANIFEST_PATH = os.path.join(".build", "assets.json")
+SEARCH_INDEX_PATH = os.path.join(".build", "search.json")
+METADATA_INDEX_PATH = os.path.join(".build", "metadata.json")
+SHARD_DIR = os.path.join(".build", "shards")
+
+def add_build_args(parser):
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="render pages in N worker processes (0 = one per CPU)")
+    parser.add_argument("--cache-size", type=int, default=256, metavar="MB",
+                        help="size cap of the parsed-markdown cache (0 disables it)")
+    parser.add_argument("--static-mode", choices=COPY_MODES, default="auto",
+                        help="how changed static files are put in place (default: auto)")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="give static files content-hashed names and link to those")
+    parser.add_argument("--no-images", dest="images", action="store_false",
+                        help="skip image size hints and srcset variants")
+    parser.add_argument("--search", action="store_true",
+                        help="write a client-side search index to docs/search/")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="absolute URL docs/ is served from; writes sitemap.xml and an Atom feed.xml")
+    parser.add_argument("--listings", action="store_true",
+                        help="write paginated blog and tag listing pages")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write .gz (and with brotli, .br) copies of text outputs")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site into docs/.")
+    parser.add_argument("basepath", nargs="?", default="/",
+                        help="URL prefix the site is served from (default: /)")
+    add_build_args(parser)
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="build only shard i of N, into --shard-dir, for a later --merge")
+    parser.add_argument("--merge", type=int, metavar="N",
+                        help="combine the outputs of shards 1..N into docs/")
+    parser.add_argument("--shard-dir", default=SHARD_DIR,
+                        help=f"directory shared by the shards (default: {SHARD_DIR})")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each build stage and page, and list the slowest pages")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="with --profile, how many of the slowest pages to list (default: 10)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="with --profile, also write a Chrome trace-event JSON file")
+    args = parser.parse_args(argv)
+    if args.shard and args.merge:
+        parser.error("--shard and --merge cannot be combined")
+    if args.trace and not args.profile:
+        parser.error("--trace requires --profile")
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+def open_cache(args):
+    if args.cache_size > 0:
+        return ParseCache(PARSE_CACHE_DIR, args.cache_size * 1024 * 1024)
+    return None
+
+def build_search(dst, manifest):
+    pages = find_pages(CONTENT_DIR, dst, manifest.scan)
+    urls = {dest_html: page_url(dest_html, dst) for _, dest_html in pages}
+    index = SearchIndex.load(SEARCH_INDEX_PATH)
+    build_search_index(pages, urls, dst, index, manifest)
+    index.save()
+
+def build_listings(args, dst, manifest, assets=None):
+    pages = find_pages(CONTENT_DIR, dst, manifest.scan)
+    urls = {dest_html: page_url(dest_html, dst) for _, dest_html in pages}
+    index = MetadataIndex.load(METADATA_INDEX_PATH)
+    build_aggregates(pages, urls, dst, index, TEMPLATE_PATH, args.basepath, manifest,
+                     site_url=args.site_url, listings=args.listings, assets=assets)
+    index.save()
+
+def build_site(args, src, dst, manifest, cache):
+    # returns the image table and asset names the pages were rendered with
+    assets = {} if args.fingerprint else None
+    with profiling.stage("copy_static"):
+        copy_static(src, dst, manifest, mode=args.static_mode, assets=assets, shard=args.shard)
+    images = None
+    if args.images:
+        with profiling.stage("images"):
+            images = process_images(src, dst, IMAGE_CACHE_DIR, manifest, jobs=args.jobs,
+                                    shard=args.shard, assets=assets)
+    if assets is not None:
+        # with the names of the image variants
+        if args.shard:
+            write_asset_manifest(shard_assets_path(args.shard_dir, args.shard), assets)
+        else:
+            write_asset_manifest(ASSET_MANIFEST_PATH, assets)
+    generate_pages_recursive(CONTENT_DIR, TEMPLATE_PATH, dst, args.basepath, manifest,
+                             jobs=args.jobs, cache=cache, images=images, assets=assets,
+                             shard=args.shard)
+    return {"images": images, "assets": assets}
+
+def build(args, manifest=None, cache=None, options=None):
+    # options, if given, is filled with what build_site rendered pages with,
+    # for callers that later rebuild single pages (see serve.DevSite)
+    src = STATIC_DIR
+    dst = OUTPUT_DIR
+    manifest_path = MANIFEST_PATH
+    if args.shard:
+        dst, manifest_path = shard_paths(args.shard_dir, args.shard)
+
+    # outputs are rebuilt incrementally: the manifest records what each file
+    # in dst was built from, so only stale outputs get regenerated
+    os.makedirs(dst, exist_ok=True)
+    if manifest is None:
+        manifest = BuildManifest.load(manifest_path)
+    if cache is None:
+        cache = open_cache(args)
+    manifest.start_build()
+
+    try:
+        if args.merge:
+            assets = {} if args.fingerprint else None
+            with profiling.stage("merge"):
+                merge_shards(args.shard_dir, args.merge, dst, manifest, assets)
+            if assets is not None:
+                write_asset_manifest(ASSET_MANIFEST_PATH, assets)
+        else:
+            page_options = build_site(args, src, dst, manifest, cache)
+            if options is not None:
+                options.update(page_options)
+            assets = page_options["assets"]
+        # a shard leaves the whole-site stages to the merge
+        if (args.site_url or args.listings) and not args.shard:
+            with profiling.stage("aggregates"):
+                build_listings(args, dst, manifest, assets)
+        if args.search and not args.shard:
+            with profiling.stage("search"):
+                build_search(dst, manifest)
+        if args.precompress and not args.shard:
+            with profiling.stage("compress"):
+                precompress(dst, manifest, jobs=args.jobs)
+        for path in manifest.prune(dst):
+            print(f"Removed stale output: {path}")
+    finally:
+        manifest.save()
+        if cache is not None:
+            cache.evict()
+    return manifest
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.profile:
+        build(args)
+        return
+    profiler = profiling.enable()
+    try:
+        build(args)
+    finally:
+        profiling.disable()
+        print(profiler.report(args.profile_top))
+        if args.trace:
+            profiler.write_trace(args.trace)
+            print(f"Trace written to {args.trace}")
     
 
 if __name__ == "__main__":
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+
+from depgraph import DependencyGraph
+from fileio import hash_file, write_json
+from scan import ScanIndex
+
+# Bump whenever a change to the generator alters its output, so that every
+# page built by an older version gets regenerated. Markdown parser changes
+# bump block.PARSER_VERSION instead, which each page's inputs include.
+GENERATOR_VERSION = "3"
+
+
+def json_digest(data):
+    # digest of a table the outputs embed (image sizes, asset names), so
+    # they can depend on it like on a file
+    text = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BuildManifest:
+    def __init__(self, path=None):
+        self.path = path
+        # dest path -> inputs it was last built from
+        self.outputs = {}
+        # source path -> [size, mtime_ns, sha256], so unchanged sources are
+        # never re-read just to hash them
+        self.files = {}
+        # image path -> [sha256, [width, height] or None], so unchanged
+        # images are never opened just to read their size
+        self.image_sizes = {}
+        self.graph = DependencyGraph()
+        # URLs of the site's pages as of the last build, to tell which
+        # pages appeared or disappeared since
+        self.page_urls = set()
+        # directory listings, so unchanged source trees are not re-listed
+        self.scan = ScanIndex()
+        self.seen = set()
+        self.hashed = set()
+
+    @classmethod
+    def load(cls, path):
+        manifest = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+        if data.get("version") != GENERATOR_VERSION:
+            return manifest
+        manifest.outputs = data.get("outputs", {})
+        manifest.files = data.get("files", {})
+        manifest.image_sizes = data.get("images", {})
+        manifest.graph = DependencyGraph(data.get("graph", {}))
+        manifest.page_urls = set(data.get("pages", []))
+        manifest.scan = ScanIndex(data.get("dirs", {}))
+        return manifest
+
+    def save(self):
+        if self.path is None:
+            return
+        data = {
+            "version": GENERATOR_VERSION,
+            "outputs": self.outputs,
+            "files": self.files,
+            "images": self.image_sizes,
+            "graph": self.graph.edges,
+            "pages": sorted(self.page_urls),
+            "dirs": self.scan.dirs,
+        }
+        write_json(self.path, data, sort_keys=True)
+
+    def start_build(self):
+        # forget what a previous build in this process touched, so prune()
+        # only keeps outputs the coming build produces
+        self.seen = set()
+        self.hashed = set()
+        self.scan.start_build()
+
+    def digest(self, path):
+        self.hashed.add(path)
+        st = os.stat(path)
+        cached = self.files.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        digest = hash_file(path)
+        self.files[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def is_current(self, dest, inputs):
+        self.seen.add(dest)
+        return self.outputs.get(dest) == inputs and os.path.exists(dest)
+
+    def record(self, dest, inputs, deps=None):
+        self.seen.add(dest)
+        self.outputs[dest] = inputs
+        if deps is not None:
+            self.graph.set(dest, deps)
+
+    def remove_output(self, dest, root):
+        self.outputs.pop(dest, None)
+        self.graph.remove(dest)
+        self.seen.discard(dest)
+        if os.path.isfile(dest):
+            os.remove(dest)
+            remove_empty_dirs(os.path.dirname(dest), root)
+            return True
+        return False
+
+    def prune(self, root):
+        # Remove outputs recorded by a previous build whose sources are gone.
+        removed = []
+        for dest in sorted(set(self.outputs) - self.seen):
+            del self.outputs[dest]
+            self.graph.remove(dest)
+            if os.path.isfile(dest):
+                os.remove(dest)
+                removed.append(dest)
+                remove_empty_dirs(os.path.dirname(dest), root)
+        for path in set(self.files) - self.hashed:
+            del self.files[path]
+        for path in set(self.image_sizes) - self.hashed:
+            del self.image_sizes[path]
+        self.scan.prune()
+        return removed
+
+
+def remove_empty_dirs(path, root):
+    root = os.path.abspath(root)
+    path = os.path.abspath(path)
+    while path.startswith(root + os.sep):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
@@ -0,0 +1,59 @@
+import json
+
+from fileio import write_json
+
+# Data read from each page's source (search terms, listing metadata), kept
+# in a JSON file with the digest of the source, so a build only re-reads
+# the sources that changed. Subclasses set FORMAT and read_page().
+
+
+class PageIndex:
+    # version of the kept data; an index saved with another one is dropped
+    FORMAT = None
+
+    def __init__(self, path=None):
+        self.path = path
+        # source path -> [digest, url, *read_page(source)]
+        self.pages = {}
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if data.get("version") == cls.FORMAT:
+            index.pages = data.get("pages", {})
+        return index
+
+    def save(self):
+        if self.path is None:
+            return
+        write_json(self.path, {"version": self.FORMAT, "pages": self.pages}, separators=(",", ":"))
+
+    def read_page(self, path, markdown):
+        # the fields kept for the source at path, or None to leave it out
+        raise NotImplementedError
+
+    def update(self, pages, urls, digest):
+        # Re-reads the (source, destination) pages whose digest changed and
+        # forgets pages that are gone. Returns how many were read.
+        updated = 0
+        wanted = set()
+        for from_path, dest_path in pages:
+            wanted.add(from_path)
+            source_digest = digest(from_path)
+            entry = self.pages.get(from_path)
+            if entry is not None and entry[0] == source_digest and entry[1] == urls[dest_path]:
+                continue
+            with open(from_path, "r", encoding="utf-8") as f:
+                fields = self.read_page(from_path, f.read())
+            if fields is None:
+                continue
+            self.pages[from_path] = [source_digest, urls[dest_path], *fields]
+            updated += 1
+        for path in set(self.pages) - wanted:
+            del self.pages[path]
+        return updated
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+
+import profiling
+from block import PARSER_VERSION, markdown_to_html_node
+from fileio import replacing, write_json
+from htmlnode import node_from_data, node_to_data
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ParseCache:
+    # On-disk cache of parsed documents, one JSON file per distinct markdown
+    # text, keyed by a hash of the text and PARSER_VERSION. A file's mtime is
+    # bumped on every hit, so evict() can drop the least recently used
+    # entries once the cache grows past max_bytes.
+    #
+    # The cache's size is kept in a ledger: evict() writes the total after
+    # scanning the entries, and every put() appends the size of its entry,
+    # from whichever process, so a build that stays under max_bytes reads
+    # one small file instead of stat()ing every entry.
+    LEDGER = "ledger"
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, markdown):
+        h = hashlib.sha256(PARSER_VERSION.encode())
+        h.update(b"\0")
+        h.update(markdown.encode("utf-8"))
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, markdown):
+        path = self.path(self.key(markdown))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return node_from_data(data)
+
+    def put(self, markdown, node):
+        path = self.path(self.key(markdown))
+        # written under a unique name and renamed, so that concurrent
+        # workers never read a half-written entry
+        size = write_json(path, node_to_data(node), separators=(",", ":"))
+        # one short O_APPEND write, so concurrent workers do not interleave
+        with open(os.path.join(self.directory, self.LEDGER), "a", encoding="utf-8") as f:
+            f.write(f"{size}\n")
+
+    def parse(self, markdown):
+        with profiling.stage("cache"):
+            node = self.get(markdown)
+        if node is not None:
+            self.hits += 1
+            return node
+        self.misses += 1
+        node = markdown_to_html_node(markdown)
+        with profiling.stage("cache"):
+            self.put(markdown, node)
+        return node
+
+    def ledger_total(self):
+        # (size of the cache by the ledger, lines in it), or (None, 0) if
+        # there is no ledger yet
+        try:
+            with open(os.path.join(self.directory, self.LEDGER), "r", encoding="utf-8") as f:
+                sizes = [int(line) for line in f]
+        except (OSError, ValueError):
+            return None, 0
+        return sum(sizes), len(sizes)
+
+    def write_ledger(self, total):
+        with replacing(os.path.join(self.directory, self.LEDGER)) as tmp_path:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(f"{total}\n")
+
+    def evict(self):
+        if not os.path.isdir(self.directory):
+            return 0
+        total, lines = self.ledger_total()
+        if total is not None and total <= self.max_bytes:
+            if lines > 1:
+                # fold the appended sizes into one line
+                self.write_ledger(total)
+            return 0
+        entries = []
+        total = 0
+        for dirpath, _, names in os.walk(self.directory):
+            for name in names:
+                if dirpath == self.directory and name.lstrip(".").startswith(self.LEDGER):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.write_ledger(total)
+        return removed
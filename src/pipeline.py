@@ -0,0 +1,79 @@
+import queue
+import threading
+
+# Three-stage pipeline for the in-process build: reader threads load
+# sources, the calling thread does the CPU work, and writer threads put the
+# results on disk, so file I/O overlaps with parsing and rendering. Bounded
+# queues between the stages cap how many items are held in memory.
+
+PIPELINE_DEPTH = 8
+
+_DONE = object()
+
+
+def run_pipeline(items, read, process, write, depth=PIPELINE_DEPTH, readers=2, writers=2):
+    # Runs write(item, process(item, read(item))) for every item and returns
+    # the exception each item failed with, or None, in the order of items.
+    # At most depth items wait between two stages.
+    items = list(items)
+    errors = [None] * len(items)
+    read_queue = queue.Queue(depth)
+    write_queue = queue.Queue(depth)
+    indexes = iter(range(len(items)))
+    lock = threading.Lock()
+
+    def reader():
+        while True:
+            with lock:
+                index = next(indexes, None)
+            if index is None:
+                break
+            try:
+                data = read(items[index])
+            except Exception as e:
+                errors[index] = e
+                continue
+            read_queue.put((index, data))
+        read_queue.put(_DONE)
+
+    def writer():
+        while True:
+            entry = write_queue.get()
+            if entry is _DONE:
+                break
+            index, result = entry
+            try:
+                write(items[index], result)
+            except Exception as e:
+                errors[index] = e
+
+    # daemon threads, so an interrupted build does not hang on a full queue
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=writer, daemon=True) for _ in range(writers)]
+    for thread in threads + writer_threads:
+        thread.start()
+
+    running = readers
+    try:
+        while running:
+            entry = read_queue.get()
+            if entry is _DONE:
+                running -= 1
+                continue
+            index, data = entry
+            try:
+                result = process(items[index], data)
+            except Exception as e:
+                errors[index] = e
+                continue
+            write_queue.put((index, result))
+    finally:
+        # the writers finish what they were given, also when the build is
+        # interrupted, so none is still writing once this returns
+        for _ in writer_threads:
+            write_queue.put(_DONE)
+        for thread in writer_threads:
+            thread.join()
+    for thread in threads:
+        thread.join()
+    return errors
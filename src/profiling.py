@@ -0,0 +1,123 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# Build profiler. Pipeline code wraps its stages in profiling.stage(name);
+# that is a no-op unless a Profiler has been enabled for the process, e.g.
+# by `python3 src/main.py --profile`.
+
+_active = None
+_NULL = contextlib.nullcontext()
+
+
+class Profiler:
+    def __init__(self):
+        # stage name -> [total seconds, calls]
+        self.stages = {}
+        # page source path -> seconds spent building it
+        self.pages = {}
+        # (stage, start, duration, pid, tid, page) for trace output
+        self.events = []
+        self.current_page = None
+        self.start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            totals = self.stages.setdefault(name, [0.0, 0])
+            totals[0] += elapsed
+            totals[1] += 1
+            self.events.append((name, start, elapsed, os.getpid(), threading.get_ident(), self.current_page))
+
+    @contextlib.contextmanager
+    def page(self, path):
+        self.current_page = path
+        start = time.perf_counter()
+        try:
+            with self.stage("page"):
+                yield
+        finally:
+            self.pages[path] = self.pages.get(path, 0.0) + time.perf_counter() - start
+            self.current_page = None
+
+    def take(self):
+        # Hands over and clears what was recorded so far; worker processes
+        # send this back to the parent, which merge()s it.
+        data = {"stages": self.stages, "pages": self.pages, "events": self.events}
+        self.stages, self.pages, self.events = {}, {}, []
+        return data
+
+    def merge(self, data):
+        for name, (seconds, calls) in data["stages"].items():
+            totals = self.stages.setdefault(name, [0.0, 0])
+            totals[0] += seconds
+            totals[1] += calls
+        for path, seconds in data["pages"].items():
+            self.pages[path] = self.pages.get(path, 0.0) + seconds
+        self.events.extend(data["events"])
+
+    def report(self, top=10):
+        wall = time.perf_counter() - self.start
+        lines = [f"Build profile ({wall * 1000:.1f} ms wall)"]
+        lines.append(f"  {'stage':<16} {'total ms':>10} {'calls':>8} {'% wall':>7}")
+        for name, (seconds, calls) in sorted(self.stages.items(), key=lambda item: -item[1][0]):
+            share = seconds / wall * 100 if wall else 0.0
+            lines.append(f"  {name:<16} {seconds * 1000:>10.1f} {calls:>8} {share:>6.1f}%")
+        if self.pages:
+            lines.append(f"Slowest {min(top, len(self.pages))} of {len(self.pages)} pages")
+            slowest = sorted(self.pages.items(), key=lambda item: -item[1])[:top]
+            for path, seconds in slowest:
+                lines.append(f"  {seconds * 1000:>10.1f} ms  {path}")
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        # Chrome trace-event format, viewable in chrome://tracing or Perfetto
+        events = []
+        for name, start, duration, pid, tid, page in self.events:
+            event = {
+                "name": name,
+                "cat": "build",
+                "ph": "X",
+                "ts": (start - self.start) * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": tid,
+            }
+            if page is not None:
+                event["args"] = {"page": page}
+            events.append(event)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def enable():
+    global _active
+    _active = Profiler()
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def current():
+    return _active
+
+
+def stage(name):
+    if _active is None:
+        return _NULL
+    return _active.stage(name)
+
+
+def page(path):
+    if _active is None:
+        return _NULL
+    return _active.page(path)
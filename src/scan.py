@@ -0,0 +1,81 @@
+import os
+import time
+
+# Directory scanning shared by the build. Listings come from os.scandir,
+# whose entries already know whether they are files or directories, so
+# nothing is stat()ed per file. With a ScanIndex, a directory whose mtime
+# has not changed since the last build is not listed again: its names are
+# taken from the index, and only its subdirectories are stat()ed.
+
+# Listings of directories modified this recently are not stored, since a
+# change within the same mtime tick would go unnoticed.
+RACY_NS = 2 * 10**9
+
+
+class ScanIndex:
+    def __init__(self, dirs=None):
+        # directory path -> [mtime_ns, [[name, is_dir], ...]]
+        self.dirs = dirs or {}
+        self.visited = set()
+
+    def listing(self, path, st):
+        self.visited.add(path)
+        cached = self.dirs.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns:
+            return cached[1]
+        return None
+
+    def store(self, path, st, entries):
+        if time.time_ns() - st.st_mtime_ns > RACY_NS:
+            self.dirs[path] = [st.st_mtime_ns, entries]
+        else:
+            self.dirs.pop(path, None)
+
+    def start_build(self):
+        self.visited = set()
+
+    def prune(self):
+        # forget directories the build did not come across
+        for path in set(self.dirs) - self.visited:
+            del self.dirs[path]
+
+
+def list_dir(path):
+    # [[name, is_dir], ...] sorted by name, leaving out anything that is
+    # neither a file nor a directory
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir():
+                entries.append([entry.name, True])
+            elif entry.is_file():
+                entries.append([entry.name, False])
+    entries.sort()
+    return entries
+
+
+def scan_tree(root, index=None, skip=None):
+    # Paths of the files under root, in a stable order: each directory's
+    # entries sorted by name, subdirectories expanded in place. skip(name)
+    # leaves out files and directories by name.
+    files = []
+    def walk(path):
+        if index is not None:
+            st = os.stat(path)
+            entries = index.listing(path, st)
+            if entries is None:
+                entries = list_dir(path)
+                index.store(path, st, entries)
+        else:
+            entries = list_dir(path)
+        for name, is_dir in entries:
+            if skip is not None and skip(name):
+                continue
+            child = os.path.join(path, name)
+            if is_dir:
+                walk(child)
+            else:
+                files.append(child)
+    if os.path.isdir(root):
+        walk(root)
+    return files
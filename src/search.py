@@ -0,0 +1,106 @@
+import json
+import os
+import re
+from collections import Counter
+
+from block import BlockType, block_to_text, iter_blocks
+from fileio import OutputWriter, hash_file
+from frontmatter import split_front_matter
+from pageindex import PageIndex
+from textnode import extract_title, text_to_text_nodes
+
+# Client-side search index, written to docs/search/:
+#
+#   index.json        {"version": 1, "pages": [[url, title], ...],
+#                      "shards": ["a", "b", ...]}
+#   terms/<key>.json  {term: [page, count, page, count, ...], ...}
+#
+# A term's postings live in the shard named after its first character, so
+# the browser fetches index.json once and then only the shards of the
+# query's terms. Pages are referred to by their position in "pages".
+# Terms of each page are kept in .build/search.json with the digest of its
+# source, so a build only re-tokenizes the pages that changed.
+
+SEARCH_FORMAT = 1
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+
+def page_text(markdown):
+    # the text a reader sees: inline markup is dropped through the TextNode
+    # stream, and link text and image alt text are kept
+    for block_type, block in iter_blocks(markdown.split("\n")):
+        text = block_to_text(block, block_type)
+        if block_type == BlockType.CODE:
+            yield text
+            continue
+        for line in text if isinstance(text, list) else (text,):
+            for node in text_to_text_nodes(line):
+                yield node.text
+
+
+def page_terms(markdown):
+    counts = Counter()
+    for text in page_text(markdown):
+        counts.update(tokenize(text))
+    return dict(counts)
+
+
+def shard_key(term):
+    first = term[0]
+    return first if first.isascii() and first.isalnum() else "_"
+
+
+class SearchIndex(PageIndex):
+    # source path -> [digest, url, title, {term: count}]
+    FORMAT = SEARCH_FORMAT
+
+    def read_page(self, path, markdown):
+        _, markdown = split_front_matter(markdown)
+        try:
+            title = extract_title(markdown)
+        except Exception:
+            return None
+        return [title, page_terms(markdown)]
+
+    def shards(self):
+        # (page list, {shard key: {term: postings}}) in a stable order
+        entries = sorted(self.pages.values(), key=lambda entry: entry[1])
+        page_list = [[url, title] for _, url, title, _ in entries]
+        shards = {}
+        for page_id, (_, _, _, terms) in enumerate(entries):
+            for term, count in terms.items():
+                shard = shards.setdefault(shard_key(term), {})
+                shard.setdefault(term, []).extend((page_id, count))
+        return page_list, {key: dict(sorted(shard.items())) for key, shard in shards.items()}
+
+
+def write_if_changed(path, text, writer, manifest=None):
+    # unchanged shards keep their mtime, so caches and syncs leave them be
+    if manifest is not None:
+        manifest.record(path, {"search": SEARCH_FORMAT})
+    return writer.write(path, (text,))
+
+
+def build_search_index(pages, urls, dest_dir, index, manifest=None):
+    # Brings index up to date with pages and writes the search files under
+    # dest_dir/search. urls maps each page's destination to its URL.
+    digest = manifest.digest if manifest is not None else hash_file
+    updated = index.update(pages, urls, digest)
+    page_list, shards = index.shards()
+    search_dir = os.path.join(dest_dir, "search")
+    written = 0
+    with OutputWriter() as writer:
+        for key, shard in shards.items():
+            path = os.path.join(search_dir, "terms", f"{key}.json")
+            written += write_if_changed(path, json.dumps(shard, separators=(",", ":")), writer, manifest)
+        data = {"version": SEARCH_FORMAT, "pages": page_list, "shards": sorted(shards)}
+        written += write_if_changed(os.path.join(search_dir, "index.json"),
+                                    json.dumps(data, separators=(",", ":")), writer, manifest)
+    terms = sum(len(shard) for shard in shards.values())
+    print(f"Search index: {len(page_list)} pages, {terms} terms in {len(shards)} shards, "
+          f"{updated} pages tokenized, {written} files written")
+    return page_list, shards
@@ -0,0 +1,252 @@
+import argparse
+import http.server
+import os
+import threading
+import time
+from functools import partial
+
+from compress import precompress
+from copystatic import copy_file
+from depgraph import asset_node, source_node
+from generate_pages import find_pages, generate_pages, page_dest
+from images import IMAGE_EXTENSIONS, process_images
+from main import (CONTENT_DIR, IMAGE_CACHE_DIR, MANIFEST_PATH, OUTPUT_DIR, STATIC_DIR, TEMPLATE_PATH,
+                  add_build_args, build, build_listings, build_search, open_cache)
+from manifest import BuildManifest
+from watcher import open_watcher
+
+# Development server: builds the site, serves docs/, and with --watch keeps
+# rebuilding whatever changed and tells open pages to reload.
+#
+#   python3 src/serve.py --watch [--port 8888]
+
+RELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = (
+    b'<script>new EventSource("' + RELOAD_PATH.encode() + b'")'
+    b".onmessage = () => location.reload();</script>"
+)
+
+
+def inject_reload_script(html):
+    index = html.rfind(b"</body>")
+    if index == -1:
+        return html + RELOAD_SCRIPT
+    return html[:index] + RELOAD_SCRIPT + html[index:]
+
+
+class DevSite:
+    # Keeps the manifest and parse cache in memory between rebuilds and
+    # rebuilds only the outputs of the files that changed.
+    def __init__(self, args):
+        self.args = args
+        self.manifest = BuildManifest.load(MANIFEST_PATH)
+        self.cache = open_cache(args)
+        # image table and asset names of the last full build
+        self.options = {}
+
+    def build(self):
+        build(self.args, self.manifest, self.cache, self.options)
+
+    def rebuild(self, changed):
+        if (TEMPLATE_PATH in changed or self.pages_added_or_removed(changed)
+                or self.pages_see_static_change(changed)):
+            # a full incremental build, which also regenerates the pages
+            # linking to pages that appeared or disappeared, or showing
+            # fingerprinted assets that changed
+            self.build()
+            return
+        pages = []
+        copied = False
+        # URLs of the changed images
+        images = set()
+        for path in sorted(changed):
+            if ":" in os.path.basename(path):
+                continue
+            if is_under(path, CONTENT_DIR):
+                if os.path.basename(path) != "index.md":
+                    continue
+                dest = page_dest(path, CONTENT_DIR, OUTPUT_DIR)
+                if os.path.isfile(path):
+                    pages.append((path, dest))
+                else:
+                    self.remove_output(dest)
+            elif is_under(path, STATIC_DIR):
+                dst_path = os.path.join(OUTPUT_DIR, os.path.relpath(path, STATIC_DIR))
+                if os.path.isfile(path):
+                    copied |= copy_file(path, dst_path, self.manifest, self.args.static_mode)
+                else:
+                    self.remove_output(dst_path, path)
+                if self.args.images and path.lower().endswith(IMAGE_EXTENSIONS):
+                    images.add("/" + os.path.relpath(path, STATIC_DIR).replace(os.sep, "/"))
+        try:
+            if images:
+                self.options["images"] = process_images(STATIC_DIR, OUTPUT_DIR, IMAGE_CACHE_DIR, self.manifest,
+                                                        jobs=self.args.jobs)
+                # the pages showing a changed image, found through the
+                # dependency graph; generate_pages rebuilds those whose
+                # size hints or srcset actually changed
+                showing = self.manifest.graph.affected({asset_node(url) for url in images})
+                pages += [page for page in find_pages(CONTENT_DIR, OUTPUT_DIR, self.manifest.scan)
+                          if page[1] in showing and page not in pages]
+            if pages:
+                generate_pages(pages, TEMPLATE_PATH, self.args.basepath, self.manifest,
+                               cache=self.cache, **self.options)
+                if self.args.site_url or self.args.listings:
+                    # titles, dates or tags may have changed
+                    build_listings(self.args, OUTPUT_DIR, self.manifest, self.options.get("assets"))
+                if self.args.search:
+                    build_search(OUTPUT_DIR, self.manifest)
+            if self.args.precompress and (pages or copied or images):
+                precompress(OUTPUT_DIR, self.manifest, jobs=self.args.jobs)
+        finally:
+            self.manifest.save()
+
+    def remove_output(self, dest, source=None):
+        # removes dest and the outputs made from it or from its source: its
+        # .gz/.br siblings, an image's srcset variants
+        nodes = {dest} if source is None else {dest, source_node(source)}
+        for path in [dest] + sorted(self.manifest.graph.affected(nodes) - {dest}):
+            if self.manifest.remove_output(path, OUTPUT_DIR):
+                print(f"Removed stale output: {path}")
+
+    def pages_added_or_removed(self, changed):
+        for path in changed:
+            if is_under(path, CONTENT_DIR) and os.path.basename(path) == "index.md":
+                dest = page_dest(path, CONTENT_DIR, OUTPUT_DIR)
+                if os.path.isfile(path) != (dest in self.manifest.outputs):
+                    return True
+        return False
+
+    def pages_see_static_change(self, changed):
+        # with fingerprinting, any changed static file renames its output
+        if self.args.fingerprint:
+            return any(is_under(path, STATIC_DIR) for path in changed)
+        return False
+
+
+def is_under(path, directory):
+    return os.path.commonpath([os.path.abspath(path), os.path.abspath(directory)]) == os.path.abspath(directory)
+
+
+class LiveReload:
+    def __init__(self):
+        self.version = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, seen, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != seen, timeout)
+            return self.version
+
+
+class DevRequestHandler(http.server.SimpleHTTPRequestHandler):
+    def __init__(self, *args, reloader=None, **kwargs):
+        self.reloader = reloader
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        url_path = self.path.split("?", 1)[0].split("#", 1)[0]
+        if url_path == RELOAD_PATH and self.reloader is not None:
+            self.stream_reloads()
+            return
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and url_path.endswith("/"):
+            path = os.path.join(path, "index.html")
+        if self.reloader is not None and path.endswith(".html") and os.path.isfile(path):
+            with open(path, "rb") as f:
+                body = inject_reload_script(f.read())
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+    def stream_reloads(self):
+        # Server-sent events: one "reload" message per rebuild, with a
+        # comment line every 15s so dead connections get noticed.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        seen = self.reloader.version
+        try:
+            while True:
+                version = self.reloader.wait(seen, 15)
+                if version != seen:
+                    seen = version
+                    self.wfile.write(b"data: reload\n\n")
+                else:
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def log_message(self, format, *args):
+        pass
+
+
+def watch(site, reloader, interval):
+    watcher = open_watcher([CONTENT_DIR, STATIC_DIR, TEMPLATE_PATH], interval)
+    print(f"Watching for changes ({type(watcher).__name__})")
+    while True:
+        changed = watcher.wait()
+        start = time.perf_counter()
+        try:
+            if changed is None:
+                # directories appeared or went away
+                site.build()
+            else:
+                site.rebuild(changed)
+        except Exception as e:
+            print(f"Rebuild failed: {e}")
+            continue
+        reloader.notify()
+        elapsed = (time.perf_counter() - start) * 1000
+        what = "the site" if changed is None else f"{len(changed)} changed file(s)"
+        print(f"Rebuilt {what} in {elapsed:.0f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and serve the site from docs/.")
+    parser.add_argument("--watch", action="store_true",
+                        help="rebuild on changes and live-reload open pages")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--interval", type=float, default=0.05,
+                        help="seconds between checks for changed files where inotify is "
+                             "not available; with inotify, how long to gather the events of one save")
+    add_build_args(parser)
+    args = parser.parse_args(argv)
+    # the dev server serves docs/ at the root, whatever basepath deploys use
+    args.basepath = "/"
+    # the dev server always builds the whole site into docs/
+    args.shard = args.merge = None
+    if args.jobs <= 0:
+        args.jobs = os.cpu_count() or 1
+
+    site = DevSite(args)
+    site.build()
+    reloader = LiveReload() if args.watch else None
+    handler = partial(DevRequestHandler, directory=OUTPUT_DIR, reloader=reloader)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    server.daemon_threads = True
+    print(f"Serving {OUTPUT_DIR}/ on http://127.0.0.1:{args.port}/")
+    if not args.watch:
+        server.serve_forever()
+        return
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        watch(site, reloader, args.interval)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
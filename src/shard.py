@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+from fileio import hash_file
+from manifest import BuildManifest
+
+# Sharded builds: `--shard i/N` builds only the sources whose path hashes to
+# shard i of N, into a directory of its own with a partial manifest, so N
+# machines (or processes) can build one site between them. `--merge N` then
+# combines the shard directories into docs/ and one manifest, refusing to
+# go on if two shards produced different contents for the same output.
+
+
+def parse_shard(spec):
+    # "2/4" -> (2, 4); shards are numbered from 1. ArgumentTypeError, so
+    # argparse shows the message
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard {spec!r}, expected i/N") from None
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard {spec!r}, expected 1 <= i <= N")
+    return index, count
+
+
+def shard_of(rel_path, count):
+    # The shard a source belongs to, from a hash of its path relative to
+    # its tree, so every machine partitions the same way.
+    key = rel_path.replace(os.sep, "/").encode("utf-8")
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big") % count + 1
+
+
+def in_shard(path, root, shard):
+    if shard is None:
+        return True
+    index, count = shard
+    return shard_of(os.path.relpath(path, root), count) == index
+
+
+def shard_root(directory, shard):
+    index, count = shard
+    return os.path.join(directory, f"{index}-of-{count}")
+
+
+def shard_paths(directory, shard):
+    # (output directory, manifest path) of a shard
+    root = shard_root(directory, shard)
+    return os.path.join(root, "docs"), os.path.join(root, "manifest.json")
+
+
+def shard_assets_path(directory, shard):
+    # where a --fingerprint shard writes its asset names; each shard has
+    # its own, as shards may run at the same time
+    return os.path.join(shard_root(directory, shard), "assets.json")
+
+
+def _remap(path, src_root, dst_root):
+    rel = os.path.relpath(path, src_root)
+    if rel.startswith(os.pardir + os.sep) or rel == os.pardir:
+        return path
+    return os.path.join(dst_root, rel)
+
+
+def merge_shards(directory, count, dest, manifest, assets=None):
+    # Copies the outputs of shards 1..count into dest and merges their
+    # manifests into manifest, which then describes dest as if it had been
+    # built in one go; manifest.prune() afterwards removes the outputs of an
+    # earlier build that no shard produced. Returns the merged outputs.
+    # Given an assets dict, it is filled with the asset names the shards
+    # were built with (see copy_static), which must all be the same.
+    # dest path -> (shard, digest, shard output, inputs, deps)
+    owners = {}
+    files = {}
+    page_urls = set()
+    shard_assets = None
+    conflicts = []
+    for index in range(1, count + 1):
+        out_dir, manifest_path = shard_paths(directory, (index, count))
+        if not os.path.exists(manifest_path):
+            raise Exception(f"shard {index}/{count} has not been built: {manifest_path} is missing")
+        part = BuildManifest.load(manifest_path)
+        if assets is not None:
+            assets_path = shard_assets_path(directory, (index, count))
+            try:
+                with open(assets_path, "r", encoding="utf-8") as f:
+                    names = json.load(f)
+            except FileNotFoundError:
+                raise Exception(f"shard {index}/{count} was built without --fingerprint: "
+                                f"{assets_path} is missing") from None
+            if shard_assets is None:
+                shard_assets = names
+            elif names != shard_assets:
+                conflicts.append(f"{assets_path}: shards 1 and {index} have different asset names")
+        manifest.image_sizes.update(part.image_sizes)
+        for path, entry in part.files.items():
+            known = files.setdefault(path, entry)
+            if known[2] != entry[2]:
+                conflicts.append(f"{path}: shards were built from different versions of it")
+        for output, inputs in part.outputs.items():
+            dest_path = _remap(output, out_dir, dest)
+            digest = hash_file(output)
+            owner = owners.get(dest_path)
+            if owner is not None:
+                if owner[1] != digest:
+                    conflicts.append(f"{dest_path}: shards {owner[0]} and {index} differ")
+                continue
+            deps = part.graph.edges.get(output)
+            if deps is not None:
+                deps = [_remap(node, out_dir, dest) for node in deps]
+            owners[dest_path] = (index, digest, output, inputs, deps)
+        page_urls |= part.page_urls
+    # nothing is touched until all shards are known to agree
+    if conflicts:
+        raise Exception(f"cannot merge {count} shards, {len(conflicts)} conflict(s):\n"
+                        + "\n".join(f"  {conflict}" for conflict in conflicts))
+
+    manifest.start_build()
+    copied = 0
+    for dest_path, (_, digest, output, inputs, deps) in sorted(owners.items()):
+        if not (os.path.isfile(dest_path) and hash_file(dest_path) == digest):
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            shutil.copy2(output, dest_path)
+            copied += 1
+        manifest.record(dest_path, inputs, deps)
+    manifest.files.update(files)
+    manifest.hashed.update(files)
+    manifest.page_urls = page_urls
+    if assets is not None:
+        assets.update(shard_assets or {})
+    print(f"Merged {count} shards: {len(owners)} outputs, {copied} copied")
+    return sorted(owners)
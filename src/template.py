@@ -0,0 +1,108 @@
+import os
+import re
+
+_SLOT_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_URL_ATTRS = ("href", "src")
+_URL_ATTR_RE = re.compile(r'\b(href|src)="(/[^"]*)"')
+
+
+def url_path(url):
+    # "/index.css?v=2#top" -> "/index.css"
+    end = len(url)
+    for sep in "?#":
+        index = url.find(sep)
+        if index != -1:
+            end = min(end, index)
+    return url[:end]
+
+
+def asset_url(url, assets):
+    # the fingerprinted name of a static asset, keeping any query/fragment:
+    # "/index.css?v=2" -> "/index.3f9a1c20.css?v=2"
+    if not assets:
+        return url
+    path = url_path(url)
+    fingerprinted = assets.get(path)
+    return url if fingerprinted is None else fingerprinted + url[len(path):]
+
+
+def rewrite_basepath(html, basepath, assets=None):
+    # Root-relative URLs in the template's own markup (stylesheets, nav
+    # links) are served from under basepath, under their fingerprinted
+    # names if they are assets.
+    if assets:
+        return _URL_ATTR_RE.sub(
+            lambda m: f'{m.group(1)}="{basepath}{asset_url(m.group(2), assets)[1:]}"', html
+        )
+    for attr in _URL_ATTRS:
+        html = html.replace(f'{attr}="/', f'{attr}="{basepath}')
+    return html
+
+
+def basepath_props(basepath, assets=None):
+    # props_hook for HTMLNode.iter_html applying the same rewrite to the
+    # href/src attributes of rendered markdown, and to nothing else in it.
+    if basepath == "/" and not assets:
+        return None
+
+    def hook(tag, props):
+        if not props:
+            return props
+        rewritten = None
+        for attr in _URL_ATTRS:
+            value = props.get(attr)
+            if isinstance(value, str) and value.startswith("/"):
+                if rewritten is None:
+                    rewritten = dict(props)
+                rewritten[attr] = basepath + asset_url(value, assets)[1:]
+        return props if rewritten is None else rewritten
+    return hook
+
+
+class Template:
+    # template.html compiled once into static segments and the {{ Name }}
+    # slots between them: segments[0] slots[0] segments[1] ... segments[-1].
+    def __init__(self, text, basepath="/", assets=None):
+        self.basepath = basepath
+        self.assets = assets
+        self.segments = []
+        self.slots = []
+        # the root-relative URLs of its own markup, which every page shows
+        self.urls = sorted({url_path(m.group(2)) for m in _URL_ATTR_RE.finditer(text)})
+        pos = 0
+        for match in _SLOT_RE.finditer(text):
+            self.segments.append(rewrite_basepath(text[pos:match.start()], basepath, assets))
+            self.slots.append(match.group(1))
+            pos = match.end()
+        self.segments.append(rewrite_basepath(text[pos:], basepath, assets))
+
+    def iter_render(self, values):
+        # Slot values are strings, or callables returning an iterable of
+        # chunks (used to stream the page body). Unset slots render empty.
+        yield self.segments[0]
+        for name, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(name, "")
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value()
+            yield segment
+
+    def render(self, values):
+        return "".join(self.iter_render(values))
+
+
+_cache = {}
+
+def load_template(path, basepath="/", assets=None):
+    # Compiled templates are reused until the file on disk changes.
+    abs_path = os.path.abspath(path)
+    st = os.stat(abs_path)
+    key = (abs_path, basepath, tuple(sorted(assets.items())) if assets else None)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == (st.st_size, st.st_mtime_ns):
+        return cached[1]
+    with open(abs_path, "r", encoding="utf-8") as f:
+        template = Template(f.read(), basepath, assets)
+    _cache[key] = ((st.st_size, st.st_mtime_ns), template)
+    return template
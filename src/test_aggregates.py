@@ -0,0 +1,90 @@
+import os
+import unittest
+import xml.etree.ElementTree as ET
+
+import aggregates
+from aggregates import *
+from manifest import BuildManifest
+from testutil import TempDirTestCase, read, write
+
+
+class TestAggregates(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.pages = []
+        self.urls = {}
+        self.add("", "# Home")
+        for i in range(5):
+            self.add(f"blog/p{i}", f"---\ndate: 2024-01-0{i + 1}\ntags: Tea, {'odd' if i % 2 else 'even'}\n---\n# Post {i}")
+        self.manifest = BuildManifest(os.path.join(self.root, "manifest.json"))
+        self.index = MetadataIndex(os.path.join(self.root, "metadata.json"))
+
+    def add(self, rel, markdown):
+        source = os.path.join(self.root, "content", rel, "index.md")
+        dest = os.path.normpath(os.path.join(self.dest, rel, "index.html"))
+        write(source, markdown)
+        self.pages.append((source, dest))
+        self.urls[dest] = "/" + rel if rel else "/"
+        return source
+
+    def build(self):
+        self.manifest.start_build()
+        build_aggregates(self.pages, self.urls, self.dest, self.index, self.template, "/base/",
+                         self.manifest, site_url="https://example.org/", listings=True)
+
+    def test_metadata(self):
+        source = self.add("about", "# About <us>")
+        os.utime(source, (0, 365 * 86400))
+        self.assertEqual(page_metadata(source, read(source)), ("About <us>", "1971-01-01T00:00:00+00:00", []))
+        self.assertEqual(parse_tags('["Tea", Go , go]'), ["Go", "Tea", "go"])
+        self.assertEqual(parse_date("2024-05-01T10:00:00+02:00"), "2024-05-01T10:00:00+02:00")
+        self.assertEqual(tag_slug("C++ & Go"), "c-go")
+        with self.assertRaises(Exception):
+            page_metadata(source, "---\ndate: soon\n---\n# T")
+
+    def test_sitemap_and_feed(self):
+        self.build()
+        ns = {"s": "http://www.sitemaps.org/schemas/sitemap/0.9", "a": "http://www.w3.org/2005/Atom"}
+        sitemap = ET.parse(os.path.join(self.dest, "sitemap.xml"))
+        self.assertIn("https://example.org/blog/p3/", [loc.text for loc in sitemap.findall(".//s:loc", ns)])
+        feed = ET.parse(os.path.join(self.dest, "feed.xml"))
+        self.assertEqual(feed.find("a:title", ns).text, "Home")
+        titles = [title.text for title in feed.findall("a:entry/a:title", ns)]
+        self.assertEqual(titles, ["Post 4", "Post 3", "Post 2", "Post 1", "Post 0"])
+
+    def test_paginated_listings(self):
+        size = aggregates.PAGE_SIZE
+        aggregates.PAGE_SIZE = 2
+        try:
+            self.build()
+        finally:
+            aggregates.PAGE_SIZE = size
+        first = read(os.path.join(self.dest, "blog", "index.html"))
+        self.assertIn('<a href="/base/blog/p4">Post 4</a>', first)
+        self.assertIn('<a href="/base/blog/page/2/" rel="next">Older</a>', first)
+        self.assertIn("Post 0", read(os.path.join(self.dest, "blog", "page", "3", "index.html")))
+        self.assertIn("Post 3", read(os.path.join(self.dest, "tags", "odd", "index.html")))
+        self.assertIn('<a href="/base/tags/tea/">Tea</a> (5)', read(os.path.join(self.dest, "tags", "index.html")))
+
+    def test_incremental_updates(self):
+        self.build()
+        self.index.save()
+        self.index = MetadataIndex.load(self.index.path)
+        odd = os.path.join(self.dest, "tags", "odd", "index.html")
+        even = os.path.join(self.dest, "tags", "even", "index.html")
+        os.utime(odd, ns=(10**18, 10**18))
+        os.utime(even, ns=(10**18, 10**18))
+        write(self.pages[1][0], "---\ndate: 2024-01-01\ntags: even\n---\n# Post zero")
+        self.build()
+        self.assertEqual(os.stat(odd).st_mtime_ns, 10**18)
+        self.assertNotEqual(os.stat(even).st_mtime_ns, 10**18)
+        self.assertIn("Post zero", read(even))
+        self.assertIn("Tea</a> (4)", read(os.path.join(self.dest, "tags", "index.html")))
+        self.assertEqual(self.index.update(self.pages, self.urls, self.manifest.digest), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -75,4 +75,63 @@ class test_block(unittest.TestCase):
         self.assertEqual(
             html,
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
-        )
\ No newline at end of file
+        )
+
+    def test_fenced_code_keeps_blank_lines(self):
+        md = "# Title\n\n```\nfirst\n\nsecond\n```\nafter the fence"
+        self.assertEqual(
+            list(iter_blocks(md.split("\n"))),
+            [
+                (BlockType.HEADING, "# Title"),
+                (BlockType.CODE, "```\nfirst\n\nsecond\n```"),
+                (BlockType.PARAGRAPH, "after the fence"),
+            ],
+        )
+        html = markdown_to_html_node(md).to_html()
+        self.assertIn("<pre><code>first\n\nsecond\n</code></pre>", html)
+
+    def test_iter_blocks_types_match_block_to_block_type(self):
+        md = """# Heading
+
+> quote one
+> quote two
+
+- a
+- b
+
+1. one
+2. two
+
+1. one
+3. three
+
+```
+code
+```
+
+plain
+text"""
+        for block_type, block in iter_blocks(md.split("\n")):
+            self.assertEqual(block_type, block_to_block_type(block), block)
+
+    def test_fenced_code_language_is_highlighted(self):
+        node = markdown_to_html_node("```python\nx = 1  # one\n```")
+        self.assertEqual(
+            node.to_html(),
+            '<div><pre><code class="language-python">x = <span class="tok-num">1</span>  '
+            '<span class="tok-com"># one</span>\n</code></pre></div>',
+        )
+        node = markdown_to_html_node("```elflang\nfunc\n```")
+        self.assertEqual(node.to_html(), '<div><pre><code class="language-elflang">func\n</code></pre></div>')
+
+    def test_fence_language_cannot_leave_its_attribute(self):
+        node = markdown_to_html_node('```x" onmouseover="alert(1)\nfunc\n```')
+        self.assertEqual(node.to_html(), '<div><pre><code class="language-x">func\n</code></pre></div>')
+
+    def test_iter_blocks_reads_file_lines(self):
+        import io
+        f = io.StringIO("para one\r\nstill one\n\n\n- item\n")
+        self.assertEqual(
+            list(iter_blocks(f)),
+            [(BlockType.PARAGRAPH, "para one\nstill one"), (BlockType.ULIST, "- item")],
+        )
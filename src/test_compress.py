@@ -0,0 +1,82 @@
+import gzip
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from compress import *
+from manifest import BuildManifest
+from testutil import TempDirTestCase, read_tree, write
+
+
+class TestPrecompress(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = os.path.join(self.root, "blog", "index.html")
+        write(self.page, "<p>hello</p>" * 100)
+        write(os.path.join(self.root, "index.css"), "body {}")
+        write(os.path.join(self.root, "images", "a.png"), "x" * 1000)
+
+    def test_compresses_large_text_files_only(self):
+        precompress(self.root, formats=("gzip",))
+        self.assertEqual(find_compressible(self.root), [self.page])
+        with gzip.open(self.page + ".gz", "rt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "index.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "images", "a.png.gz")))
+
+    def test_skips_current_siblings(self):
+        totals = precompress(self.root, formats=("gzip",))
+        self.assertEqual(totals["gzip"][0], 1)
+        self.assertEqual(precompress(self.root, formats=("gzip",))["gzip"][0], 0)
+        write(self.page, "<p>changed</p>" * 100)
+        os.utime(self.page, ns=(0, os.stat(self.page + ".gz").st_mtime_ns + 1))
+        self.assertEqual(precompress(self.root, formats=("gzip",))["gzip"][0], 1)
+
+    def test_identical_siblings_are_left_alone(self):
+        precompress(self.root, formats=("gzip",))
+        sibling = os.stat(self.page + ".gz")
+        # rewritten with the same bytes: the sibling is checked, not rewritten
+        write(self.page, "<p>hello</p>" * 100)
+        os.utime(self.page, ns=(0, sibling.st_mtime_ns + 1))
+        with redirect_stdout(io.StringIO()) as output:
+            precompress(self.root, formats=("gzip",))
+        self.assertIn("0 changed on disk", output.getvalue())
+        self.assertEqual(os.stat(self.page + ".gz").st_ino, sibling.st_ino)
+        self.assertTrue(is_compressed(self.page, "gzip"))
+
+    def test_interrupted_compression_leaves_no_temporary_files(self):
+        write(os.path.join(self.root, "other.html"), "<p>other</p>" * 100)
+        with mock.patch("compress.compress_data", side_effect=[b"x", KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                precompress(self.root, formats=("gzip",))
+        self.assertEqual([path for path in read_tree(self.root) if path.endswith((".tmp", ".gz"))], [])
+
+    def test_manifest_tracks_siblings(self):
+        manifest = BuildManifest()
+        manifest.record(self.page, {})
+        precompress(self.root, manifest, formats=("gzip",))
+        self.assertIn(self.page + ".gz", manifest.outputs)
+        self.assertEqual(precompress(self.root, manifest, formats=("gzip",))["gzip"][0], 0)
+        self.assertEqual(manifest.graph.affected({self.page}), {self.page + ".gz"})
+
+    def test_siblings_of_pruned_outputs_are_pruned(self):
+        manifest = BuildManifest()
+        manifest.record(self.page, {})
+        precompress(self.root, manifest, formats=("gzip",))
+        manifest.start_build()
+        precompress(self.root, manifest, formats=("gzip",))
+        self.assertEqual(manifest.prune(self.root), [self.page, self.page + ".gz"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "blog")))
+
+    @unittest.skipIf(not HAVE_BROTLI, "brotli is not installed")
+    def test_brotli(self):
+        import brotli
+        precompress(self.root, formats=("br",))
+        with open(self.page + ".br", "rb") as f:
+            self.assertEqual(brotli.decompress(f.read()), b"<p>hello</p>" * 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import unittest
+
+from copystatic import *
+from testutil import TempDirTestCase, read, write
+
+
+class TestCopyStatic(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = os.path.join(self.root, "static")
+        self.dst = os.path.join(self.root, "out")
+        write(os.path.join(self.src, "index.css"), "body {}")
+        write(os.path.join(self.src, "images", "a.png"), "png")
+        write(os.path.join(self.src, "images", "a.png:Zone.Identifier"), "x")
+
+    def test_copies_then_skips_unchanged(self):
+        copied = copy_static(self.src, self.dst, mode="copy")
+        self.assertEqual(len(copied), 2)
+        self.assertEqual(read(os.path.join(self.dst, "images", "a.png")), "png")
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "images", "a.png:Zone.Identifier")))
+        self.assertEqual(copy_static(self.src, self.dst, mode="copy"), [])
+
+    def test_copies_changed_file(self):
+        copy_static(self.src, self.dst)
+        write(os.path.join(self.src, "index.css"), "body { color: red }")
+        copied = copy_static(self.src, self.dst)
+        self.assertEqual(copied, [(os.path.join(self.src, "index.css"), os.path.join(self.dst, "index.css"))])
+        self.assertEqual(read(os.path.join(self.dst, "index.css")), "body { color: red }")
+
+    def test_checksum_skips_touched_but_identical_files(self):
+        copy_static(self.src, self.dst)
+        os.utime(os.path.join(self.src, "index.css"), ns=(10**9, 10**9))
+        self.assertEqual(copy_static(self.src, self.dst, checksum=True), [])
+        self.assertEqual(len(copy_static(self.src, self.dst)), 1)
+
+    def test_fingerprinted_names(self):
+        assets = {}
+        copy_static(self.src, self.dst, assets=assets)
+        css = assets["/index.css"]
+        self.assertRegex(css, r"^/index\.[0-9a-f]{8}\.css$")
+        self.assertEqual(read(os.path.join(self.dst, css[1:])), "body {}")
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "index.css")))
+        self.assertRegex(assets["/images/a.png"], r"^/images/a\.[0-9a-f]{8}\.png$")
+        # a change gives the file a new name
+        write(os.path.join(self.src, "index.css"), "body { color: red }")
+        assets = {}
+        copy_static(self.src, self.dst, assets=assets, delete=True)
+        self.assertNotEqual(assets["/index.css"], css)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, css[1:])))
+
+    def test_hardlink_mode(self):
+        copy_static(self.src, self.dst, mode="hardlink")
+        src_st = os.stat(os.path.join(self.src, "index.css"))
+        dst_st = os.stat(os.path.join(self.dst, "index.css"))
+        self.assertEqual(src_st.st_ino, dst_st.st_ino)
+        # replacing the source breaks the link; the next sync copies it and
+        # must not write through the old link
+        os.remove(os.path.join(self.src, "index.css"))
+        write(os.path.join(self.src, "index.css"), "changed")
+        copy_static(self.src, self.dst, mode="copy")
+        self.assertEqual(read(os.path.join(self.dst, "index.css")), "changed")
+        self.assertNotEqual(
+            os.stat(os.path.join(self.src, "index.css")).st_ino,
+            os.stat(os.path.join(self.dst, "index.css")).st_ino,
+        )
+
+    def test_delete_removes_orphans(self):
+        copy_static(self.src, self.dst)
+        write(os.path.join(self.dst, "old", "gone.png"), "x")
+        copy_static(self.src, self.dst, delete=True)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "old")))
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "index.css")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import io
+import os
+import threading
+import unittest
+from contextlib import redirect_stdout
+
+import client
+import daemon
+from testutil import TempDirTestCase, write
+
+
+class TestDaemon(TempDirTestCase):
+    chdir = True
+
+    def setUp(self):
+        super().setUp()
+        write("template.html", "<title>{{ Title }}</title><body>{{ Content }}</body>")
+        write(os.path.join("content", "index.md"), "# Home\n\nhello")
+        write(os.path.join("content", "post", "index.md"), "# Post\n\nbody")
+        write(os.path.join("static", "index.css"), "body {}")
+
+    def call(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = client.main(list(argv) + ["--socket", "test.sock"])
+        return status, output.getvalue()
+
+    def test_parse_client_args(self):
+        self.assertEqual(
+            client.parse_client_args(["/base/", "--changed", "a.md", "-j", "2", "--changed", "b.md"]),
+            (["/base/", "-j", "2"], ["a.md", "b.md"], False, client.SOCKET_PATH),
+        )
+
+    def test_builds_through_the_daemon(self):
+        with redirect_stdout(io.StringIO()):
+            thread = threading.Thread(target=daemon.serve, args=("test.sock",))
+            thread.start()
+        try:
+            for _ in range(100):
+                if os.path.exists("test.sock"):
+                    break
+                threading.Event().wait(0.01)
+            status, output = self.call("/")
+            self.assertEqual(status, 0)
+            self.assertIn("Built by daemon", output)
+            self.assertTrue(os.path.exists(os.path.join("docs", "post", "index.html")))
+
+            write(os.path.join("content", "post", "index.md"), "# Post\n\nchanged")
+            status, output = self.call("/", "--changed", os.path.join("content", "post", "index.md"))
+            self.assertIn("Generating page from content/post/index.md", output)
+            self.assertNotIn("content/index.md", output)
+            with open(os.path.join("docs", "post", "index.html"), encoding="utf-8") as f:
+                self.assertIn("changed", f.read())
+
+            # however the path is spelled, a template change rebuilds every page
+            write("template.html", "<title>{{ Title }}</title><main>{{ Content }}</main>")
+            status, output = self.call("/", "--changed", os.path.join(".", "template.html"))
+            self.assertIn("Generating page from content/index.md", output)
+            with open(os.path.join("docs", "post", "index.html"), encoding="utf-8") as f:
+                self.assertIn("<main>", f.read())
+
+            status, output = self.call("--bogus")
+            self.assertEqual(status, 1)
+            self.assertIn("unrecognized arguments", output)
+        finally:
+            self.call("--stop")
+            thread.join(5)
+        self.assertFalse(os.path.exists("test.sock"))
+
+
+if __name__ == "__main__":
+    unittest.main()
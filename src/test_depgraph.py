@@ -0,0 +1,35 @@
+import unittest
+
+from depgraph import *
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def test_affected_is_transitive(self):
+        graph = DependencyGraph()
+        graph.set("docs/a.html", ["source:a.md", "template:t.html"])
+        graph.set("docs/b.html", ["source:b.md", "template:t.html", "page:/a"])
+        graph.set("docs/feed.xml", ["docs/a.html", "docs/b.html"])
+        self.assertEqual(graph.affected({"source:a.md"}), {"docs/a.html", "docs/feed.xml"})
+        self.assertEqual(graph.affected({"page:/a"}), {"docs/b.html", "docs/feed.xml"})
+        self.assertEqual(graph.affected({"template:t.html"}), {"docs/a.html", "docs/b.html", "docs/feed.xml"})
+        self.assertEqual(graph.affected({"source:unknown.md"}), set())
+
+    def test_remove_updates_dependents(self):
+        graph = DependencyGraph()
+        graph.set("docs/b.html", ["page:/a"])
+        self.assertEqual(graph.dependents("page:/a"), ["docs/b.html"])
+        graph.remove("docs/b.html")
+        self.assertEqual(graph.dependents("page:/a"), [])
+
+    def test_normalize_url(self):
+        self.assertEqual(normalize_url("/blog/tom"), "/blog/tom")
+        self.assertEqual(normalize_url("/blog/tom/#intro"), "/blog/tom")
+        self.assertEqual(normalize_url("/blog/tom/index.html"), "/blog/tom")
+        self.assertEqual(normalize_url("/"), "/")
+        self.assertIsNone(normalize_url("https://www.boot.dev"))
+        self.assertIsNone(normalize_url("//cdn.example.com/x"))
+        self.assertIsNone(normalize_url("relative/path"))
+
+
+if __name__ == "__main__":
+    unittest.main()
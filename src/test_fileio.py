@@ -0,0 +1,113 @@
+import os
+import unittest
+
+import fileio
+from fileio import *
+from testutil import TempDirTestCase, write
+
+
+class TestFileIO(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.root, "a.md")
+
+    def write(self, data):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_iter_lines_of_mapped_file(self):
+        self.write("# Tëst\n\r\nlast ☃".encode("utf-8"))
+        with map_file(self.path) as buf:
+            self.assertEqual(list(iter_lines(buf)), ["# Tëst\n", "\r\n", "last ☃"])
+
+    def test_empty_file(self):
+        self.write(b"")
+        with map_file(self.path) as buf:
+            self.assertEqual(list(iter_lines(buf)), [])
+
+    def test_head_text_drops_split_character(self):
+        self.assertEqual(head_text("aé".encode("utf-8"), size=2), "a")
+
+    def test_write_json(self):
+        path = os.path.join(self.root, ".build", "a.json")
+        size = write_json(path, {"b": 1, "a": [2]}, sort_keys=True)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), '{"a": [2], "b": 1}')
+        self.assertEqual(size, os.path.getsize(path))
+        with self.assertRaises(TypeError):
+            write_json(path, {"a": object()})
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["a.json"])
+
+    def test_copy_file_range(self):
+        if not hasattr(os, "copy_file_range"):
+            self.skipTest("os.copy_file_range is not available")
+        self.write(b"x" * 100000)
+        os.utime(self.path, ns=(10**18, 10**18))
+        dst = os.path.join(self.root, "b.md")
+        copy_file_range(self.path, dst)
+        with open(dst, "rb") as f:
+            self.assertEqual(f.read(), b"x" * 100000)
+        self.assertEqual(os.stat(dst).st_mtime_ns, 10**18)
+
+
+class TestOutputWriter(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.root, "out", "index.html")
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_changed_files_appear_on_flush(self):
+        writer = OutputWriter()
+        self.assertTrue(writer.write(self.path, ["<p>", "snö", "</p>"]))
+        self.assertFalse(os.path.exists(self.path))
+        writer.flush()
+        self.assertEqual(self.read(), "<p>snö</p>".encode("utf-8"))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+    def test_identical_files_are_left_alone(self):
+        writer = OutputWriter(durable=False)
+        writer.write(self.path, ["same"])
+        os.utime(self.path, ns=(10**18, 10**18))
+        self.assertFalse(writer.write(self.path, ["sa", b"me"]))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 10**18)
+        self.assertTrue(writer.write(self.path, ["other"]))
+        self.assertEqual(self.read(), b"other")
+        self.assertEqual((writer.changed, writer.unchanged), (2, 1))
+
+    def test_large_outputs_are_compared_by_hash(self):
+        limit = fileio.MAX_BUFFERED
+        fileio.MAX_BUFFERED = 4
+        try:
+            writer = OutputWriter(batch=1)
+            self.assertTrue(writer.write(self.path, ["abc", "def", "ghi"]))
+            self.assertFalse(writer.write(self.path, ["abcdef", "ghi"]))
+            self.assertTrue(writer.write(self.path, ["abcdef", "ghj"]))
+        finally:
+            fileio.MAX_BUFFERED = limit
+        self.assertEqual(self.read(), b"abcdefghj")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+    def test_failed_block_discards_pending_files(self):
+        with self.assertRaises(KeyboardInterrupt):
+            with OutputWriter() as writer:
+                writer.write(self.path, ["new"])
+                raise KeyboardInterrupt
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [])
+        with OutputWriter() as writer:
+            writer.write(self.path, ["new"])
+        self.assertEqual(self.read(), b"new")
+
+    def test_remove_temp_files(self):
+        # as left by a process that died before flushing
+        OutputWriter().write(self.path, ["lost"])
+        other = os.path.join(os.path.dirname(self.path), ".other.1-0.tmp")
+        write(other, "kept")
+        remove_temp_files([self.path])
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), [".other.1-0.tmp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
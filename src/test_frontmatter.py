@@ -0,0 +1,18 @@
+import unittest
+
+from frontmatter import *
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_fields_are_split_off(self):
+        fields, body = split_front_matter("---\nDate: 2024-05-01\n\ntags: [a, b]\n---\n# Title\n")
+        self.assertEqual(fields, {"date": "2024-05-01", "tags": "[a, b]"})
+        self.assertEqual(body, "# Title\n")
+
+    def test_sources_without_front_matter_are_left_alone(self):
+        for markdown in ["# Title", "---", "---\ndate: 2024\n# Title", "---\nnot a field\n---\n# T"]:
+            self.assertEqual(split_front_matter(markdown), ({}, markdown))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+
+from generate_pages import *
+from manifest import BuildManifest
+from testutil import TempDirTestCase, read_tree, write
+
+
+TEMPLATE = '<title>{{ Title }}</title><link href="/index.css"><body>{{ Content }}</body>'
+
+
+class TestGeneratePages(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        write(self.template, TEMPLATE)
+        for i in range(12):
+            write(
+                os.path.join(self.content, "blog", f"post{i}", "index.md"),
+                f"# Post {i}\n\nSee [home](/) and **bold** number {i}\n\n- a\n- b",
+            )
+        write(os.path.join(self.content, "index.md"), "# Home\n\n![img](/images/x.png)")
+
+    def test_parallel_matches_serial(self):
+        serial = os.path.join(self.root, "serial")
+        parallel = os.path.join(self.root, "parallel")
+        generate_pages_recursive(self.content, self.template, serial, "/base/")
+        generate_pages_recursive(self.content, self.template, parallel, "/base/", jobs=3)
+        self.assertEqual(len(read_tree(serial)), 13)
+        self.assertEqual(read_tree(serial), read_tree(parallel))
+
+    def test_identical_pages_are_not_rewritten(self):
+        dest = os.path.join(self.root, "docs")
+        generate_pages_recursive(self.content, self.template, dest, "/base/", jobs=2)
+        home = os.path.join(dest, "index.html")
+        post = os.path.join(dest, "blog", "post0", "index.html")
+        for path in (home, post):
+            os.utime(path, ns=(10**18, 10**18))
+        write(os.path.join(self.content, "blog", "post0", "index.md"), "# Post 0\n\nEdited")
+        generate_pages_recursive(self.content, self.template, dest, "/base/")
+        self.assertEqual(os.stat(home).st_mtime_ns, 10**18)
+        self.assertNotEqual(os.stat(post).st_mtime_ns, 10**18)
+        self.assertEqual(len(read_tree(dest)), 13)
+
+    def test_large_sources_are_streamed(self):
+        import generate_pages
+        normal = os.path.join(self.root, "normal")
+        streamed = os.path.join(self.root, "streamed")
+        pool = os.path.join(self.root, "pool")
+        write(os.path.join(self.content, "about", "index.md"),
+              "---\ntags: a, b\n---\n# About\n\nText on [the\nfirst post](/blog/post0/) and [more](https://x.org)")
+        manifests = {normal: BuildManifest(), streamed: BuildManifest()}
+        generate_pages_recursive(self.content, self.template, normal, "/base/", manifests[normal])
+        threshold = generate_pages.STREAM_THRESHOLD
+        generate_pages.STREAM_THRESHOLD = 0
+        try:
+            generate_pages_recursive(self.content, self.template, streamed, "/base/", manifests[streamed])
+            # and in pool workers
+            generate_pages_recursive(self.content, self.template, pool, "/base/", manifests[streamed], jobs=2)
+        finally:
+            generate_pages.STREAM_THRESHOLD = threshold
+        self.assertEqual(read_tree(normal), read_tree(streamed))
+        # the pages each one links to are recorded alike
+        def edges(manifest, dest):
+            return {os.path.relpath(output, dest): inputs for output, inputs in manifest.graph.edges.items()
+                    if output.startswith(dest + os.sep)}
+        self.assertEqual(edges(manifests[normal], normal), edges(manifests[streamed], streamed))
+        self.assertEqual(edges(manifests[streamed], pool), edges(manifests[streamed], streamed))
+        self.assertIn("page:/blog/post0", edges(manifests[streamed], streamed)[os.path.join("about", "index.html")])
+        about = read_tree(streamed)[os.path.join("about", "index.html")]
+        self.assertIn(b"<title>About</title>", about)
+        self.assertNotIn(b"tags", about)
+
+    def test_image_size_hints(self):
+        images = {"/images/x.png": {"width": 640, "height": 480, "srcset": []}}
+        dest = os.path.join(self.root, "out")
+        generate_pages_recursive(self.content, self.template, dest, "/base/", images=images)
+        html = read_tree(dest)["index.html"].decode()
+        self.assertIn('<img src="/base/images/x.png" alt="img" width="640" height="480">', html)
+
+    def test_pages_depend_on_the_images_they_show(self):
+        images = {"/images/x.png": {"width": 640, "height": 480, "srcset": []}}
+        dest = os.path.join(self.root, "out")
+        manifest = BuildManifest()
+        def build():
+            manifest.start_build()
+            with redirect_stdout(io.StringIO()) as output:
+                generate_pages_recursive(self.content, self.template, dest, "/", manifest, images=images)
+            return output.getvalue()
+        build()
+        self.assertIn("asset:/images/x.png", manifest.graph.edges[os.path.join(dest, "index.html")])
+        # another image, or another image changing, rebuilds nothing
+        images["/images/y.png"] = {"width": 1, "height": 1, "srcset": []}
+        self.assertNotIn("Generating page", build())
+        images["/images/y.png"]["width"] = 2
+        self.assertNotIn("Generating page", build())
+        images["/images/x.png"] = {"width": 320, "height": 240, "srcset": []}
+        output = build()
+        self.assertEqual(output.count("Generating page"), 1)
+        self.assertIn('width="320"', read_tree(dest)["index.html"].decode())
+
+    def test_pages_depend_on_the_assets_they_reference(self):
+        assets = {"/index.css": "/index.00000000.css", "/images/x.png": "/images/x.11111111.png"}
+        dest = os.path.join(self.root, "out")
+        manifest = BuildManifest()
+        def build():
+            manifest.start_build()
+            with redirect_stdout(io.StringIO()) as output:
+                generate_pages_recursive(self.content, self.template, dest, "/", manifest, assets=assets)
+            return output.getvalue().count("Generating page")
+        self.assertEqual(build(), 13)
+        self.assertIn('src="/images/x.11111111.png"', read_tree(dest)["index.html"].decode())
+        # an asset no page references, or one page's image, changing
+        assets["/other.css"] = "/other.22222222.css"
+        self.assertEqual(build(), 0)
+        assets["/images/x.png"] = "/images/x.33333333.png"
+        self.assertEqual(build(), 1)
+        self.assertIn('src="/images/x.33333333.png"', read_tree(dest)["index.html"].decode())
+        # the template's stylesheet is referenced by every page
+        assets["/index.css"] = "/index.44444444.css"
+        self.assertEqual(build(), 13)
+        # a link to a file that only now becomes an asset
+        write(os.path.join(self.content, "about", "index.md"), "# About\n\n[cv](/cv.pdf)")
+        self.assertEqual(build(), 1)
+        assets["/cv.pdf"] = "/cv.55555555.pdf"
+        self.assertEqual(build(), 1)
+        self.assertIn('href="/cv.55555555.pdf"', read_tree(dest)[os.path.join("about", "index.html")].decode())
+
+    def test_errors_name_each_failing_page(self):
+        bad = os.path.join(self.content, "blog", "post3", "index.md")
+        write(bad, "no title here")
+        dest = os.path.join(self.root, "out")
+        with self.assertRaises(Exception) as ctx:
+            generate_pages_recursive(self.content, self.template, dest, "/", jobs=2)
+        self.assertIn(bad, str(ctx.exception))
+        self.assertIn("no h1 header", str(ctx.exception))
+        # the other pages are still written
+        self.assertEqual(len(read_tree(dest)), 12)
+
+    def test_serial_build_errors(self):
+        bad = os.path.join(self.content, "blog", "post3", "index.md")
+        write(bad, "no title here")
+        dest = os.path.join(self.root, "out")
+        with self.assertRaises(Exception) as ctx:
+            generate_pages_recursive(self.content, self.template, dest, "/")
+        self.assertIn(bad, str(ctx.exception))
+        self.assertEqual(len(read_tree(dest)), 12)
+
+    def test_interrupted_build_leaves_no_temporary_files(self):
+        import generate_pages
+        render = generate_pages.iter_page
+        calls = []
+        def interrupt(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 5:
+                raise KeyboardInterrupt
+            return render(*args, **kwargs)
+        dest = os.path.join(self.root, "out")
+        generate_pages.iter_page = interrupt
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                generate_pages_recursive(self.content, self.template, dest, "/")
+        finally:
+            generate_pages.iter_page = render
+        self.assertEqual([path for path in read_tree(dest) if path.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
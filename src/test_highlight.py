@@ -0,0 +1,41 @@
+import unittest
+
+from highlight import *
+
+
+class TestHighlight(unittest.TestCase):
+    def test_python(self):
+        html = highlight('def f(x):\n    return "a<b" # done\n', "py")
+        self.assertEqual(
+            html,
+            '<span class="tok-kw">def</span> f(x):\n'
+            '    <span class="tok-kw">return</span> <span class="tok-str">"a&lt;b"</span> '
+            '<span class="tok-com"># done</span>\n',
+        )
+
+    def test_plain_text_is_escaped(self):
+        self.assertEqual(highlight("a < b && c", "js"), "a &lt; b &amp;&amp; c")
+
+    def test_keywords_inside_strings_and_comments(self):
+        html = highlight('x := "for" // if\n', "go")
+        self.assertEqual(html, 'x := <span class="tok-str">"for"</span> <span class="tok-com">// if</span>\n')
+
+    def test_unknown_language(self):
+        self.assertIsNone(highlight("x", "brainfuck"))
+
+    def test_fence_language(self):
+        self.assertEqual(fence_language("```Python title=a.py"), "python")
+        self.assertEqual(fence_language("```"), "")
+        self.assertEqual(fence_language("```c++"), "c++")
+        self.assertEqual(fence_language('```x" onmouseover="alert(1)'), "x")
+        self.assertEqual(fence_language('```"><script>'), "")
+
+    def test_memoized(self):
+        highlight.cache_clear()
+        highlight("print(1)", "python")
+        highlight("print(1)", "python")
+        self.assertEqual(highlight.cache_info().hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
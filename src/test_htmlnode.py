@@ -94,6 +94,30 @@ class TestParentNode(unittest.TestCase):
             parent_node.to_html(),
             "<div><span><b>grandchild</b></span></div>",
             )
-    
+
+    def test_iter_html_streams_chunks(self):
+        node = ParentNode("div", [
+            ParentNode("p", [LeafNode(None, "text "), LeafNode("b", "bold")]),
+            LeafNode("a", "link", {"href": "/x"}),
+        ])
+        chunks = list(node.iter_html())
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), node.to_html())
+
+    def test_write_to(self):
+        import io
+        node = ParentNode("div", [LeafNode("span", "child")])
+        fp = io.StringIO()
+        node.write_to(fp)
+        self.assertEqual(fp.getvalue(), "<div><span>child</span></div>")
+
+    def test_nodes_have_no_instance_dict(self):
+        for node in (HTMLNode("p"), LeafNode("b", "x"), ParentNode("div", []), TextNode("x", TextType.TEXT)):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_iter_html_missing_children(self):
+        with self.assertRaises(ValueError):
+            list(ParentNode("div", []).iter_html())
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
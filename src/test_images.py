@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from images import *
+from manifest import BuildManifest
+from testutil import TempDirTestCase, write, write_png
+
+
+class TestImages(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = os.path.join(self.root, "static")
+        self.dst = os.path.join(self.root, "docs")
+        self.cache = os.path.join(self.root, "cache")
+        write_png(os.path.join(self.src, "images", "wide.png"), 1000, 500)
+        write_png(os.path.join(self.src, "images", "small.png"), 300, 200)
+
+    def test_png_size(self):
+        self.assertEqual(png_size(os.path.join(self.src, "images", "wide.png")), (1000, 500))
+        css = os.path.join(self.src, "index.css")
+        with open(css, "w") as f:
+            f.write("body {}")
+        self.assertIsNone(png_size(css))
+
+    def test_variant_widths(self):
+        self.assertEqual(variant_widths(1000), [480, 960, 1000])
+        self.assertEqual(variant_widths(300), [300])
+
+    def test_image_props(self):
+        images = {"/images/wide.png": {"width": 1000, "height": 500,
+                                       "srcset": [["/images/wide-480w.webp", 480]]}}
+        hook = image_props(images, "/base/")
+        props = hook("img", {"src": "/images/wide.png", "alt": "x"})
+        self.assertEqual(props, {
+            "src": "/images/wide.png", "alt": "x", "width": "1000", "height": "500",
+            "srcset": "/base/images/wide-480w.webp 480w",
+        })
+        self.assertEqual(hook("img", {"src": "/images/other.png"}), {"src": "/images/other.png"})
+        self.assertEqual(hook("a", {"href": "/images/wide.png"}), {"href": "/images/wide.png"})
+
+    def test_process_images_sizes_every_image(self):
+        images = process_images(self.src, self.dst, self.cache)
+        self.assertEqual(sorted(images), ["/images/small.png", "/images/wide.png"])
+        self.assertEqual((images["/images/wide.png"]["width"], images["/images/wide.png"]["height"]),
+                         (1000, 500))
+
+    def test_sizes_of_unchanged_images_are_not_reread(self):
+        manifest = BuildManifest()
+        process_images(self.src, self.dst, self.cache, manifest)
+        manifest.start_build()
+        with mock.patch("images.image_size", side_effect=AssertionError("read again")):
+            images = process_images(self.src, self.dst, self.cache, manifest)
+        self.assertEqual(images["/images/small.png"]["width"], 300)
+        write_png(os.path.join(self.src, "images", "small.png"), 200, 200)
+        manifest.start_build()
+        with mock.patch("images.image_size", wraps=image_size) as read:
+            images = process_images(self.src, self.dst, self.cache, manifest)
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(images["/images/small.png"]["width"], 200)
+
+    def test_optional_modules_load_on_use(self):
+        # importing the build loads neither Pillow nor brotli
+        code = "import sys, main; print(sorted({'PIL', 'brotli'} & set(sys.modules)))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    @unittest.skipIf(not HAVE_PILLOW, "Pillow is not installed")
+    def test_variants_are_cached(self):
+        from PIL import Image
+        images = process_images(self.src, self.dst, self.cache)
+        self.assertEqual([w for _, w in images["/images/wide.png"]["srcset"]], [480, 960, 1000])
+        variant = os.path.join(self.dst, "images", "wide-480w.webp")
+        with Image.open(variant) as im:
+            self.assertEqual(im.size, (480, 240))
+        cached = sorted(os.listdir(os.path.join(self.cache, d)) for d in os.listdir(self.cache))
+        os.remove(variant)
+        process_images(self.src, self.dst, self.cache)
+        self.assertTrue(os.path.exists(variant))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.cache, d)) for d in os.listdir(self.cache)), cached)
+
+    def test_variants_are_fingerprinted(self):
+        def make_variants(src_path, digest, cache_dir, widths):
+            paths = [cache_path(cache_dir, digest, w) for w in widths]
+            for path in paths:
+                write(path, "webp")
+            return paths
+        assets = {}
+        with mock.patch("images.HAVE_PILLOW", True), mock.patch("images._make_variants", make_variants):
+            images = process_images(self.src, self.dst, self.cache, assets=assets)
+        url, w = images["/images/wide.png"]["srcset"][0]
+        self.assertEqual(w, 480)
+        self.assertRegex(url, r"^/images/wide-480w\.[0-9a-f]+\.webp$")
+        self.assertEqual(assets["/images/wide-480w.webp"], url)
+        self.assertTrue(os.path.exists(os.path.join(self.dst, url[1:])))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "images", "wide-480w.webp")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import unittest
+
+from copystatic import copy_static
+from generate_pages import generate_pages_recursive
+from manifest import *
+from testutil import TempDirTestCase, write
+
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestBuildManifest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.docs = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest_path = os.path.join(self.root, ".build", "manifest.json")
+        write(self.template, TEMPLATE)
+        write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        write(os.path.join(self.content, "post", "index.md"), "# Post\n\nbody")
+        write(os.path.join(self.static, "index.css"), "body {}")
+
+    def build(self, basepath="/"):
+        manifest = BuildManifest.load(self.manifest_path)
+        copy_static(self.static, self.docs, manifest)
+        generate_pages_recursive(self.content, self.template, self.docs, basepath, manifest)
+        removed = manifest.prune(self.docs)
+        manifest.save()
+        return manifest, removed
+
+    def outputs(self):
+        return [
+            os.path.join(self.docs, "index.html"),
+            os.path.join(self.docs, "post", "index.html"),
+            os.path.join(self.docs, "index.css"),
+        ]
+
+    def rebuilt(self):
+        # overwrite every output with a marker, build, and report which
+        # outputs the build replaced
+        for path in self.outputs():
+            write(path, "stale")
+        self.build()
+        rebuilt = []
+        for path in self.outputs():
+            with open(path, "r", encoding="utf-8") as f:
+                if f.read() != "stale":
+                    rebuilt.append(path)
+        return rebuilt
+
+    def test_unchanged_build_writes_nothing(self):
+        self.build()
+        self.assertEqual(self.rebuilt(), [])
+
+    def test_changed_source_rebuilds_only_that_page(self):
+        self.build()
+        write(os.path.join(self.content, "post", "index.md"), "# Post\n\nnew body")
+        self.assertEqual(self.rebuilt(), [os.path.join(self.docs, "post", "index.html")])
+
+    def test_template_change_rebuilds_every_page(self):
+        self.build()
+        write(self.template, TEMPLATE + "\n")
+        self.assertEqual(self.rebuilt(), self.outputs()[:2])
+
+    def test_basepath_change_rebuilds_every_page(self):
+        self.build()
+        manifest, _ = self.build(basepath="/site/")
+        pages = [p for p in manifest.outputs if p.endswith(".html")]
+        self.assertEqual(len(pages), 2)
+        for page in pages:
+            self.assertEqual(manifest.outputs[page]["basepath"], "/site/")
+
+    def test_parser_change_rebuilds_every_page(self):
+        import generate_pages
+        self.build()
+        version = generate_pages.PARSER_VERSION
+        generate_pages.PARSER_VERSION = "other"
+        try:
+            self.assertEqual(self.rebuilt(), self.outputs()[:2])
+        finally:
+            generate_pages.PARSER_VERSION = version
+
+    def test_renamed_page_rebuilds_pages_linking_to_it(self):
+        write(os.path.join(self.content, "index.md"), "# Home\n\nsee [the post](/post)")
+        write(os.path.join(self.content, "other", "index.md"), "# Other\n\nno links")
+        self.build()
+        os.rename(os.path.join(self.content, "post"), os.path.join(self.content, "renamed"))
+        for path in self.outputs()[:2] + [os.path.join(self.docs, "other", "index.html")]:
+            if os.path.exists(path):
+                write(path, "stale")
+        manifest, removed = self.build()
+        self.assertEqual(removed, [os.path.join(self.docs, "post", "index.html")])
+        with open(os.path.join(self.docs, "index.html"), encoding="utf-8") as f:
+            self.assertNotEqual(f.read(), "stale")
+        with open(os.path.join(self.docs, "other", "index.html"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "stale")
+        self.assertIn("page:/post", manifest.graph.edges[os.path.join(self.docs, "index.html")])
+        self.assertIn("/renamed", manifest.page_urls)
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "post", "index.md"))
+        os.rmdir(os.path.join(self.content, "post"))
+        _, removed = self.build()
+        self.assertEqual(removed, [os.path.join(self.docs, "post", "index.html")])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "post")))
+        self.assertTrue(os.path.exists(self.docs))
+
+    def test_version_mismatch_discards_manifest(self):
+        self.build()
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertTrue(manifest.outputs)
+        manifest.outputs = {"x": {}}
+        manifest.save()
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            data = f.read().replace(f'"version": "{GENERATOR_VERSION}"', '"version": "old"')
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        self.assertEqual(BuildManifest.load(self.manifest_path).outputs, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
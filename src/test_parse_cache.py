@@ -0,0 +1,61 @@
+import os
+import unittest
+from unittest import mock
+
+import parse_cache
+from htmlnode import *
+from parse_cache import *
+from testutil import TempDirTestCase
+
+
+MARKDOWN = "# Title\n\nSome **bold** and a [link](/blog)\n\n- one\n- two\n\n![img](/a.png)"
+
+
+class TestParseCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ParseCache(self.root)
+
+    def test_node_data_round_trip(self):
+        node = parse_cache.markdown_to_html_node(MARKDOWN)
+        self.assertEqual(node_from_data(node_to_data(node)).to_html(), node.to_html())
+
+    def test_hit_skips_parsing(self):
+        first = self.cache.parse(MARKDOWN)
+        with mock.patch.object(parse_cache, "markdown_to_html_node") as parse:
+            second = self.cache.parse(MARKDOWN)
+            parse.assert_not_called()
+        self.assertEqual(first.to_html(), second.to_html())
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_parser_version_is_part_of_the_key(self):
+        key = self.cache.key(MARKDOWN)
+        with mock.patch.object(parse_cache, "PARSER_VERSION", "other"):
+            self.assertNotEqual(self.cache.key(MARKDOWN), key)
+
+    def test_evict_drops_least_recently_used(self):
+        docs = [f"# Doc {i}\n\n" + "text " * 200 for i in range(4)]
+        for i, doc in enumerate(docs):
+            self.cache.parse(doc)
+            os.utime(self.cache.path(self.cache.key(doc)), ns=(i * 10**9, i * 10**9))
+        size = os.path.getsize(self.cache.path(self.cache.key(docs[0])))
+        self.cache.max_bytes = size * 2
+        self.assertEqual(self.cache.evict(), 2)
+        self.assertIsNone(self.cache.get(docs[0]))
+        self.assertIsNone(self.cache.get(docs[1]))
+        self.assertIsNotNone(self.cache.get(docs[3]))
+
+    def test_evict_trusts_the_ledger_under_the_cap(self):
+        self.cache.parse(MARKDOWN)
+        size = os.path.getsize(self.cache.path(self.cache.key(MARKDOWN)))
+        self.assertEqual(self.cache.ledger_total(), (size, 1))
+        with mock.patch.object(parse_cache.os, "walk") as walk:
+            self.assertEqual(self.cache.evict(), 0)
+            walk.assert_not_called()
+        self.cache.max_bytes = size - 1
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertEqual(self.cache.ledger_total(), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import threading
+import unittest
+
+from pipeline import *
+
+
+class TestPipeline(unittest.TestCase):
+    def test_runs_every_stage_and_reports_errors_in_order(self):
+        written = {}
+        def read(item):
+            if item == 3:
+                raise OSError("unreadable")
+            return item * 10
+        def process(item, data):
+            if item == 5:
+                raise ValueError("bad")
+            return data + 1
+        def write(item, result):
+            written[item] = result
+        errors = run_pipeline(range(8), read, process, write, depth=2)
+        self.assertEqual(written, {0: 1, 1: 11, 2: 21, 4: 41, 6: 61, 7: 71})
+        self.assertIsInstance(errors[3], OSError)
+        self.assertIsInstance(errors[5], ValueError)
+        self.assertEqual([e for i, e in enumerate(errors) if i not in (3, 5)], [None] * 6)
+
+    def test_depth_bounds_items_in_flight(self):
+        lock = threading.Lock()
+        in_flight = [0, 0]
+        release = threading.Event()
+        def read(item):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[1], in_flight[0])
+            return item
+        def process(item, data):
+            return data
+        def write(item, result):
+            release.wait(0.001)
+            with lock:
+                in_flight[0] -= 1
+        run_pipeline(range(200), read, process, write, depth=4, readers=2, writers=1)
+        # each queue holds depth items, plus one per thread and the caller
+        self.assertLessEqual(in_flight[1], 4 * 2 + 2 + 1 + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+import profiling
+from block import markdown_to_html_node
+from main import parse_args
+
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        profiling.disable()
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(profiling.current())
+        with profiling.stage("x"):
+            pass
+
+    def test_records_stages_and_pages(self):
+        profiler = profiling.enable()
+        with profiling.page("content/index.md"):
+            markdown_to_html_node("# Title\n\nsome **text**\n\n- a\n- b")
+        self.assertEqual(profiler.stages["blocks"][1], 1)
+        self.assertEqual(profiler.stages["inline"][1], 4)
+        self.assertEqual(profiler.stages["page"][1], 1)
+        self.assertIn("content/index.md", profiler.pages)
+        report = profiler.report(top=5)
+        self.assertIn("inline", report)
+        self.assertIn("content/index.md", report)
+
+    def test_take_and_merge(self):
+        worker = profiling.Profiler()
+        with worker.page("a.md"):
+            with worker.stage("read"):
+                pass
+        parent = profiling.Profiler()
+        with parent.stage("read"):
+            pass
+        parent.merge(worker.take())
+        self.assertEqual(worker.stages, {})
+        self.assertEqual(parent.stages["read"][1], 2)
+        self.assertIn("a.md", parent.pages)
+
+    def test_write_trace(self):
+        profiler = profiling.enable()
+        with profiling.page("a.md"):
+            with profiling.stage("read"):
+                pass
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            profiler.write_trace(path)
+            with open(path, "r", encoding="utf-8") as f:
+                events = json.load(f)["traceEvents"]
+        self.assertEqual({e["name"] for e in events}, {"read", "page"})
+        self.assertTrue(all(e["ph"] == "X" for e in events))
+        self.assertEqual(events[0]["args"], {"page": "a.md"})
+
+    def test_profile_flag_leaves_basepath_alone(self):
+        args = parse_args(["--profile", "/repo/"])
+        self.assertTrue(args.profile)
+        self.assertEqual(args.basepath, "/repo/")
+        self.assertEqual(args.profile_top, 10)
+        self.assertEqual(parse_args(["--profile", "--profile-top", "3"]).profile_top, 3)
+
+    def test_trace_requires_profile(self):
+        self.assertEqual(parse_args(["--profile", "--trace", "t.json"]).trace, "t.json")
+        with redirect_stderr(io.StringIO()) as err, self.assertRaises(SystemExit):
+            parse_args(["--trace", "t.json"])
+        self.assertIn("--trace requires --profile", err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
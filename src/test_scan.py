@@ -0,0 +1,68 @@
+import os
+import unittest
+
+from scan import *
+from testutil import TempDirTestCase
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x")
+
+
+def age(root):
+    # back-date every directory, so the index trusts their listings
+    old = 10**18
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, ns=(old, old))
+    return old
+
+
+class TestScan(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        for rel in ("b.md", os.path.join("a", "z.md"), os.path.join("a", "c", "index.md"), "c.md"):
+            touch(os.path.join(self.root, rel))
+
+    def rel(self, paths):
+        return [os.path.relpath(p, self.root) for p in paths]
+
+    def test_sorted_walk(self):
+        self.assertEqual(
+            self.rel(scan_tree(self.root)),
+            [os.path.join("a", "c", "index.md"), os.path.join("a", "z.md"), "b.md", "c.md"],
+        )
+        self.assertEqual(self.rel(scan_tree(self.root, skip=lambda name: name == "a")), ["b.md", "c.md"])
+        self.assertEqual(scan_tree(os.path.join(self.root, "missing")), [])
+
+    def test_index_skips_unchanged_directories(self):
+        index = ScanIndex()
+        old = age(self.root)
+        expected = scan_tree(self.root, index)
+        self.assertEqual(len(index.dirs), 3)
+        # a file added without the directory's mtime changing is not seen,
+        # which shows the listing came from the index
+        touch(os.path.join(self.root, "a", "new.md"))
+        os.utime(os.path.join(self.root, "a"), ns=(old, old))
+        self.assertEqual(scan_tree(self.root, index), expected)
+        os.utime(os.path.join(self.root, "a"), ns=(old + 1, old + 1))
+        self.assertIn(os.path.join(self.root, "a", "new.md"), scan_tree(self.root, index))
+
+    def test_recent_directories_are_not_indexed(self):
+        index = ScanIndex()
+        scan_tree(self.root, index)
+        self.assertEqual(index.dirs, {})
+
+    def test_prune_forgets_unvisited_directories(self):
+        index = ScanIndex()
+        age(self.root)
+        scan_tree(self.root, index)
+        index.start_build()
+        scan_tree(os.path.join(self.root, "a"), index)
+        index.prune()
+        self.assertEqual(sorted(self.rel(index.dirs)), ["a", os.path.join("a", "c")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import os
+import unittest
+
+from search import *
+from testutil import TempDirTestCase, write
+
+
+class TestSearch(TempDirTestCase):
+    def test_page_terms_drop_markup(self):
+        terms = page_terms(
+            "# The **Hobbit**\n\nSee [Bilbo's map](/map) and ![a map](/m.png)\n\n"
+            "- one `ring`\n- two\n\n```\nprint(ring)\n```"
+        )
+        self.assertEqual(terms["map"], 2)
+        self.assertEqual(terms["ring"], 2)
+        self.assertIn("hobbit", terms)
+        self.assertNotIn("png", terms)
+        self.assertNotIn("a", terms)
+
+    def test_shards_and_incremental_update(self):
+        root = self.root
+        a = os.path.join(root, "content", "index.md")
+        b = os.path.join(root, "content", "b", "index.md")
+        write(a, "# Home\n\nElves and dwarves")
+        write(b, "# Bee\n\nDwarves only")
+        pages = [(a, "docs/index.html"), (b, "docs/b/index.html")]
+        urls = {"docs/index.html": "/", "docs/b/index.html": "/b"}
+        dest = os.path.join(root, "docs")
+        index = SearchIndex(os.path.join(root, "search.json"))
+        page_list, shards = build_search_index(pages, urls, dest, index)
+        self.assertEqual(page_list, [["/", "Home"], ["/b", "Bee"]])
+        self.assertEqual(shards["d"]["dwarves"], [0, 1, 1, 1])
+        with open(os.path.join(dest, "search", "terms", "e.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f), {"elves": [0, 1]})
+        index.save()
+
+        index = SearchIndex.load(os.path.join(root, "search.json"))
+        self.assertEqual(index.update(pages, urls, hash_file), 0)
+        write(b, "# Bee\n\nElves too")
+        self.assertEqual(index.update(pages, urls, hash_file), 1)
+        self.assertEqual(index.shards()[1]["e"]["elves"], [0, 1, 1, 1])
+        index.update(pages[:1], urls, hash_file)
+        self.assertEqual(index.shards()[0], [["/", "Home"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import gzip
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+
+from main import parse_args
+from serve import *
+from testutil import TempDirTestCase, read, write, write_png
+
+
+class TestServe(unittest.TestCase):
+    def test_inject_reload_script(self):
+        html = inject_reload_script(b"<html><body><p>x</p></body></html>")
+        self.assertEqual(html, b"<html><body><p>x</p>" + RELOAD_SCRIPT + b"</body></html>")
+        self.assertEqual(inject_reload_script(b"<p>x</p>"), b"<p>x</p>" + RELOAD_SCRIPT)
+
+    def test_is_under(self):
+        self.assertTrue(is_under(os.path.join("content", "blog", "index.md"), "content"))
+        self.assertFalse(is_under(os.path.join("contents", "index.md"), "content"))
+
+
+class TestDevSite(TempDirTestCase):
+    chdir = True
+
+    def setUp(self):
+        super().setUp()
+        write("template.html", "<title>{{ Title }}</title><body>{{ Content }}</body>")
+        write(os.path.join("content", "index.md"), "# Home\n\n" + "hello " * 100)
+        write(os.path.join("content", "post", "index.md"), "# Post\n\nbody")
+        write(os.path.join("static", "index.css"), "body {}")
+
+    def site(self, *argv, images=False):
+        site = DevSite(parse_args(([] if images else ["--no-images"]) + list(argv)))
+        self.rebuild(site, None)
+        return site
+
+    def rebuild(self, site, changed):
+        with redirect_stdout(io.StringIO()) as output:
+            if changed is None:
+                site.build()
+            else:
+                site.rebuild(set(changed))
+        return output.getvalue()
+
+    def test_rebuild_edited_page(self):
+        site = self.site()
+        post = os.path.join("content", "post", "index.md")
+        write(post, "# Post\n\nedited")
+        output = self.rebuild(site, [post])
+        self.assertIn("Generating page from content/post/index.md", output)
+        self.assertNotIn("content/index.md", output)
+        self.assertIn("edited", read(os.path.join("docs", "post", "index.html")))
+
+    def test_rebuild_deleted_page(self):
+        site = self.site()
+        post = os.path.join("content", "post", "index.md")
+        os.remove(post)
+        output = self.rebuild(site, [post])
+        self.assertIn("Removed stale output: docs/post/index.html", output)
+        self.assertFalse(os.path.exists(os.path.join("docs", "post")))
+        self.assertNotIn(os.path.join("docs", "post", "index.html"), site.manifest.outputs)
+
+    def test_rebuild_static_change(self):
+        site = self.site()
+        css = os.path.join("static", "index.css")
+        write(css, "body { color: red }")
+        output = self.rebuild(site, [css])
+        self.assertNotIn("Generating page", output)
+        self.assertEqual(read(os.path.join("docs", "index.css")), "body { color: red }")
+
+    def test_rebuild_image_change(self):
+        image = os.path.join("static", "images", "a.png")
+        write_png(image, 40, 30)
+        write(os.path.join("content", "post", "index.md"), "# Post\n\n![a](/images/a.png)")
+        site = self.site(images=True)
+        write_png(image, 60, 30)
+        output = self.rebuild(site, [image])
+        # only the page showing the image, with its new size
+        self.assertIn("Generating page from content/post/index.md", output)
+        self.assertNotIn("content/index.md", output)
+        self.assertIn('width="60"', read(os.path.join("docs", "post", "index.html")))
+        other = os.path.join("static", "images", "b.png")
+        write_png(other, 10, 10)
+        output = self.rebuild(site, [other])
+        self.assertNotIn("Generating page", output)
+        self.assertTrue(os.path.exists(os.path.join("docs", "images", "b.png")))
+
+    def test_rebuild_template_change(self):
+        site = self.site()
+        write("template.html", "<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.rebuild(site, ["template.html"])
+        for page in ("index.html", os.path.join("post", "index.html")):
+            self.assertIn("<main>", read(os.path.join("docs", page)))
+
+    def test_rebuild_runs_search_and_precompress(self):
+        site = self.site("--search", "--precompress")
+        home = os.path.join("content", "index.md")
+        write(home, "# Home\n\n" + "mithril " * 100)
+        self.rebuild(site, [home])
+        with gzip.open(os.path.join("docs", "index.html.gz"), "rt", encoding="utf-8") as f:
+            self.assertIn("mithril", f.read())
+        self.assertIn("mithril", json.loads(read(os.path.join("docs", "search", "terms", "m.json"))))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import unittest
+
+from copystatic import copy_static
+from generate_pages import generate_pages_recursive
+from manifest import BuildManifest
+from shard import *
+from testutil import TempDirTestCase, read_tree, write
+
+
+TEMPLATE = '<title>{{ Title }}</title><link href="/index.css"><body>{{ Content }}</body>'
+
+
+class TestShard(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.template = os.path.join(self.root, "template.html")
+        self.shards = os.path.join(self.root, "shards")
+        write(self.template, TEMPLATE)
+        for i in range(10):
+            write(os.path.join(self.content, "blog", f"post{i}", "index.md"),
+                  f"# Post {i}\n\n[home](/) number {i}")
+        write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        write(os.path.join(self.static, "index.css"), "body {}")
+        write(os.path.join(self.static, "images", "a.png"), "png")
+
+    def build(self, dest, manifest, shard=None):
+        copy_static(self.static, dest, manifest, shard=shard)
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest, shard=shard)
+        manifest.prune(dest)
+        manifest.save()
+
+    def build_shards(self, count):
+        for index in range(1, count + 1):
+            out_dir, manifest_path = shard_paths(self.shards, (index, count))
+            self.build(out_dir, BuildManifest.load(manifest_path), (index, count))
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for spec in ("0/4", "5/4", "1", "a/b"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(spec)
+
+    def test_every_path_is_in_exactly_one_shard(self):
+        paths = [f"blog/post{i}/index.md" for i in range(200)]
+        counts = [0] * 4
+        for path in paths:
+            owners = [i for i in range(1, 5) if in_shard(path, "", (i, 4))]
+            self.assertEqual(len(owners), 1)
+            counts[owners[0] - 1] += 1
+        self.assertTrue(all(counts))
+
+    def test_merge_matches_single_build(self):
+        single = os.path.join(self.root, "single")
+        self.build(single, BuildManifest())
+        self.build_shards(3)
+        dest = os.path.join(self.root, "docs")
+        manifest = BuildManifest(os.path.join(self.root, "manifest.json"))
+        outputs = merge_shards(self.shards, 3, dest, manifest)
+        self.assertEqual(read_tree(dest), read_tree(single))
+        self.assertEqual(len(outputs), 13)
+        self.assertEqual(sorted(manifest.outputs), outputs)
+        self.assertEqual(len(manifest.page_urls), 11)
+        # the merged manifest makes the next regular build incremental
+        manifest.start_build()
+        self.assertEqual(copy_static(self.static, dest, manifest), [])
+        mtime = os.stat(os.path.join(dest, "index.html")).st_mtime_ns
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest)
+        self.assertEqual(manifest.prune(dest), [])
+        self.assertEqual(os.stat(os.path.join(dest, "index.html")).st_mtime_ns, mtime)
+
+    def test_conflicting_shards_are_not_merged(self):
+        self.build_shards(2)
+        out_dir, _ = shard_paths(self.shards, (1, 2))
+        other_dir, other_manifest = shard_paths(self.shards, (2, 2))
+        # shard 2 also claims one of shard 1's outputs, with other contents
+        name = sorted(read_tree(out_dir))[0]
+        write(os.path.join(other_dir, name), "different")
+        manifest = BuildManifest.load(other_manifest)
+        manifest.record(os.path.join(other_dir, name), {"source": "x"})
+        manifest.save()
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(Exception) as ctx:
+            merge_shards(self.shards, 2, dest, BuildManifest())
+        self.assertIn(os.path.join(dest, name), str(ctx.exception))
+        self.assertFalse(os.path.exists(dest))
+
+    def test_asset_names_are_merged_from_the_shards(self):
+        self.build_shards(2)
+        for index in (1, 2):
+            write(shard_assets_path(self.shards, (index, 2)), json.dumps({"/index.css": "/index.ab.css"}))
+        assets = {}
+        merge_shards(self.shards, 2, os.path.join(self.root, "docs"), BuildManifest(), assets)
+        self.assertEqual(assets, {"/index.css": "/index.ab.css"})
+        write(shard_assets_path(self.shards, (2, 2)), json.dumps({"/index.css": "/index.cd.css"}))
+        with self.assertRaises(Exception) as ctx:
+            merge_shards(self.shards, 2, os.path.join(self.root, "merged"), BuildManifest(), {})
+        self.assertIn("different asset names", str(ctx.exception))
+        self.assertFalse(os.path.exists(os.path.join(self.root, "merged")))
+
+    def test_missing_shard(self):
+        self.build_shards(2)
+        with self.assertRaises(Exception):
+            merge_shards(self.shards, 3, os.path.join(self.root, "docs"), BuildManifest())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from htmlnode import *
+from template import *
+
+
+class TestTemplate(unittest.TestCase):
+    def test_compiles_segments_and_slots(self):
+        template = Template("<title>{{ Title }}</title><p>{{Date}}</p>{{ Content }}")
+        self.assertEqual(template.slots, ["Title", "Date", "Content"])
+        self.assertEqual(template.segments, ["<title>", "</title><p>", "</p>", ""])
+
+    def test_render(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}<i>{{ Description }}</i>")
+        html = template.render({"Title": "Hi", "Content": lambda: iter(["<p>", "x", "</p>"])})
+        self.assertEqual(html, "<h1>Hi</h1><p>x</p><i></i>")
+
+    def test_basepath_applied_to_template_at_compile_time(self):
+        template = Template('<link href="/index.css"><img src="/a.png">{{ Content }}', "/site/")
+        self.assertEqual(template.segments[0], '<link href="/site/index.css"><img src="/site/a.png">')
+
+    def test_basepath_does_not_touch_content_text(self):
+        template = Template("{{ Content }}", "/site/")
+        node = ParentNode("p", [
+            LeafNode(None, 'write href="/x" in text'),
+            LeafNode("a", "link", {"href": "/blog"}),
+            LeafNode("a", "ext", {"href": "https://boot.dev"}),
+            LeafNode("img", "", {"src": "/images/a.png", "alt": "a"}),
+        ])
+        hook = basepath_props(template.basepath)
+        html = template.render({"Content": lambda: node.iter_html(hook)})
+        self.assertEqual(
+            html,
+            '<p>write href="/x" in text<a href="/site/blog">link</a>'
+            '<a href="https://boot.dev">ext</a><img src="/site/images/a.png" alt="a"></img></p>',
+        )
+        # the node itself is left untouched
+        self.assertEqual(node.children[1].props, {"href": "/blog"})
+
+    def test_assets_rewritten_with_basepath(self):
+        assets = {"/index.css": "/index.0123abcd.css", "/images/a.png": "/images/a.89ef0123.png"}
+        template = Template('<link href="/index.css"><a href="/blog">{{ Content }}', "/site/", assets)
+        self.assertEqual(template.segments[0], '<link href="/site/index.0123abcd.css"><a href="/site/blog">')
+        hook = basepath_props("/", assets)
+        self.assertEqual(hook("img", {"src": "/images/a.png?v=1"}), {"src": "/images/a.89ef0123.png?v=1"})
+        self.assertEqual(hook("a", {"href": "/blog"}), {"href": "/blog"})
+
+
+if __name__ == "__main__":
+    unittest.main()
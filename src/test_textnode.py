@@ -1,5 +1,6 @@
 import unittest
 
+from bench_inline import chained_text_to_text_nodes
 from textnode import *
 
 
@@ -142,5 +143,50 @@ This is the same paragraph on a new line
             ],
         )
 
+
+class TestInlineScanner(unittest.TestCase):
+    def assertMatchesChained(self, text):
+        try:
+            expected = chained_text_to_text_nodes(text)
+        except Exception:
+            with self.assertRaises(Exception):
+                text_to_text_nodes(text)
+            return
+        self.assertEqual(text_to_text_nodes(text), expected, text)
+
+    def test_matches_chained_passes(self):
+        cases = [
+            "",
+            "plain",
+            "**bold** and __bold__ then *it* and _it_",
+            "`code` first",
+            "`a **b**` **c `d` e**",
+            "![img](a.png)[link](b)",
+            "!![img](a.png) ![x](y)![z](w)",
+            "**[link](u)** _![i](v)_",
+            "[x](![y)](z)",
+            "****",
+            "a [b](c_d) e",
+            "`` empty code",
+        ]
+        for text in cases:
+            self.assertMatchesChained(text)
+
+    def test_matches_chained_passes_fuzz(self):
+        import random
+        rng = random.Random(1234)
+        pieces = ["a", " ", "**", "__", "*", "_", "`", "[", "]", "(", ")", "!",
+                  "[t](u)", "![i](p)", "x_y"]
+        for _ in range(2000):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+            self.assertMatchesChained(text)
+
+    def test_unclosed_delimiter_raises(self):
+        with self.assertRaises(Exception):
+            text_to_text_nodes("this is **not closed")
+        with self.assertRaises(Exception):
+            text_to_text_nodes("`open code")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
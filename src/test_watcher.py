@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from watcher import *
+from testutil import TempDirTestCase, write
+
+
+class TestWatcher(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.root, "content")
+        self.page = os.path.join(self.content, "blog", "index.md")
+        self.template = os.path.join(self.root, "template.html")
+        write(self.page, "# x")
+        write(self.template, "{{ Content }}")
+
+    def test_changed_paths(self):
+        before = {"a": (1, 10), "b": (1, 10), "c": (1, 10)}
+        after = {"a": (1, 10), "b": (2, 10), "d": (1, 5)}
+        self.assertEqual(changed_paths(before, after), {"b", "c", "d"})
+
+    def test_snapshot_lists_files_recursively(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "blog", "post"))
+            for rel in ("index.md", os.path.join("blog", "post", "index.md")):
+                with open(os.path.join(root, rel), "w") as f:
+                    f.write("# x")
+            files = snapshot([root, os.path.join(root, "missing")])
+            self.assertEqual(
+                sorted(os.path.relpath(p, root) for p in files),
+                [os.path.join("blog", "post", "index.md"), "index.md"],
+            )
+
+    def test_polling(self):
+        watcher = PollingWatcher([self.content, self.template], 0.01)
+        write(self.page, "# changed")
+        self.assertEqual(watcher.wait(), {self.page})
+
+    def test_inotify(self):
+        try:
+            watcher = InotifyWatcher([self.content, self.template], 0.01)
+        except (OSError, AttributeError, TypeError):
+            self.skipTest("inotify is not available")
+        try:
+            write(self.page, "# changed")
+            write(os.path.join(self.root, "other.txt"), "not watched")
+            self.assertEqual(watcher.read_events(), {self.page})
+            write(self.template + ".tmp", "{{ Content }}!")
+            os.replace(self.template + ".tmp", self.template)
+            self.assertEqual(watcher.wait(), {self.template})
+            # a new directory makes for a full build, and is watched too
+            write(os.path.join(self.content, "new", "index.md"), "# new")
+            self.assertIsNone(watcher.read_events())
+            write(os.path.join(self.content, "new", "index.md"), "# newer")
+            self.assertEqual(watcher.read_events(), {os.path.join(self.content, "new", "index.md")})
+        finally:
+            watcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
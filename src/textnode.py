@@ -2,6 +2,10 @@ from enum import Enum
 from htmlnode import LeafNode
 import re
 
+_IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_LINK_RE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+_TITLE_RE = re.compile(r'^#\s+(.*)')
+
 class TextType(Enum):
     TEXT = "text"
     BOLD = "bold"
@@ -11,6 +15,8 @@ class TextType(Enum):
     IMAGE = "image"
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
+
     def __init__(self, text, text_type, url=None):
         self.text = text
         self.text_type = text_type
@@ -54,11 +60,11 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 
 
 def extract_markdown_images(text):
-    matches = re.findall(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    matches = _IMAGE_RE.findall(text)
     return matches
 
 def extract_markdown_links(text):
-    matches = re.findall(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)", text)
+    matches = _LINK_RE.findall(text)
     return matches
 
 def split_nodes_image(old_nodes):
@@ -117,48 +123,95 @@ def split_nodes_link(old_nodes):
                         continue
     return node_list
 
+# Tags of the text types that render without attributes; only links and
+# images need a props dict of their own.
+_LEAF_TAGS = {
+    TextType.TEXT: None,
+    TextType.BOLD: "b",
+    TextType.ITALIC: "i",
+    TextType.CODE: "code",
+}
+
 def text_node_to_html_node(text_node):
-    if text_node.text_type == TextType.TEXT:
-        node = LeafNode(None, text_node.text)
-        return node
-    elif text_node.text_type == TextType.BOLD:
-        node = LeafNode("b", text_node.text)
-        return node
-    elif text_node.text_type == TextType.ITALIC:
-        node = LeafNode("i", text_node.text)
-        return node
-    elif text_node.text_type == TextType.CODE:
-        node = LeafNode("code", text_node.text)
-        return node
-    elif text_node.text_type == TextType.LINK:
-        node = LeafNode("a", f"{text_node.text}", props = {'href': text_node.url})
+    text_type = text_node.text_type
+    if text_type in _LEAF_TAGS:
+        return LeafNode(_LEAF_TAGS[text_type], text_node.text)
+    elif text_type == TextType.LINK:
+        node = LeafNode("a", text_node.text, props = {'href': text_node.url})
         return node
-    elif text_node.text_type == TextType.IMAGE:
+    elif text_type == TextType.IMAGE:
         node = LeafNode("img", "",props={'src': text_node.url, 'alt':text_node.text })
-        return node                
+        return node
+
+# Inline markup is resolved in a fixed order of precedence: code spans, then
+# images and links, then the emphasis delimiters below. text_to_text_nodes
+# walks the text once from left to right and applies that precedence while it
+# goes, so it yields the same nodes as chaining split_nodes_delimiter,
+# split_nodes_image and split_nodes_link, without rebuilding the node list
+# once per pass or re-running the image/link regex on the leftover text.
+_EMPHASIS = (
+    ("**", TextType.BOLD),
+    ("__", TextType.BOLD),
+    ("*", TextType.ITALIC),
+    ("_", TextType.ITALIC),
+)
+
+def _scan_emphasis(text, level, nodes):
+    while level < len(_EMPHASIS) and _EMPHASIS[level][0] not in text:
+        level += 1
+    if level == len(_EMPHASIS):
+        nodes.append(TextNode(text, TextType.TEXT))
+        return
+    delimiter, text_type = _EMPHASIS[level]
+    parts = text.split(delimiter)
+    if len(parts) % 2 == 0:
+        raise Exception(f"no closing delimiter in {TextNode(text, TextType.TEXT)}")
+    for idx, part in enumerate(parts):
+        if idx % 2 == 0:
+            _scan_emphasis(part, level + 1, nodes)
+        else:
+            nodes.append(TextNode(part, text_type))
+
+def _scan_links(text, nodes):
+    pos = 0
+    for match in _LINK_RE.finditer(text):
+        if match.start() > pos:
+            _scan_emphasis(text[pos:match.start()], 0, nodes)
+        nodes.append(TextNode(match.group(1), TextType.LINK, match.group(2)))
+        pos = match.end()
+    if pos < len(text):
+        _scan_emphasis(text[pos:], 0, nodes)
+
+def _scan_images(text, nodes):
+    pos = 0
+    for match in _IMAGE_RE.finditer(text):
+        if match.start() > pos:
+            _scan_links(text[pos:match.start()], nodes)
+        nodes.append(TextNode(match.group(1), TextType.IMAGE, match.group(2)))
+        pos = match.end()
+    if pos < len(text):
+        _scan_links(text[pos:], nodes)
 
 def text_to_text_nodes(text):
-    node = TextNode(text=text, text_type=TextType.TEXT)
-    nodes = split_nodes_delimiter([node],"`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "__", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    parts = text.split("`")
+    if len(parts) % 2 == 0:
+        raise Exception(f"no closing delimiter in {TextNode(text, TextType.TEXT)}")
+    nodes = []
+    for idx, part in enumerate(parts):
+        if idx % 2 == 1:
+            nodes.append(TextNode(part, TextType.CODE))
+        elif part:
+            _scan_images(part, nodes)
     return nodes
 
 def markdown_to_blocks(markdown: str) -> list[str]:
-    raw_blocks = markdown.split("\n\n")
-    blocks = []
-    for block in raw_blocks:
-        b = block.strip()
-        if b:
-            blocks.append(b)
-    return blocks
+    # block splitting lives in block.py; imported here lazily because
+    # block.py itself imports this module
+    from block import markdown_to_blocks
+    return markdown_to_blocks(markdown)
 
 def extract_title(markdown):
-    match = re.match(r'^#\s+(.*)', markdown)
+    match = _TITLE_RE.match(markdown)
     if match:
         return match.group(1).strip()
     else:
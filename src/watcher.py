@@ -0,0 +1,173 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# Change detection for serve.py --watch. On Linux, inotify tells which
+# files changed without anything being polled, however large the tree;
+# elsewhere, or when inotify is out of watches, the tree is stat()ed every
+# interval and compared with the previous snapshot.
+#
+# wait() returns the set of changed paths, or None when the shape of the
+# tree changed (a directory appeared, disappeared or moved, or events were
+# lost) and only a full incremental build is safe.
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT = struct.Struct("iIII")
+
+
+def snapshot(paths):
+    # {file path: (mtime_ns, size)} for every file under paths
+    files = {}
+    def walk(path):
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    walk(entry.path)
+                elif entry.is_file():
+                    st = entry.stat()
+                    files[entry.path] = (st.st_mtime_ns, st.st_size)
+    for path in paths:
+        if os.path.isdir(path):
+            walk(path)
+        elif os.path.isfile(path):
+            st = os.stat(path)
+            files[path] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def changed_paths(before, after):
+    changed = {path for path, sig in after.items() if before.get(path) != sig}
+    changed.update(before.keys() - after.keys())
+    return changed
+
+
+class PollingWatcher:
+    def __init__(self, paths, interval):
+        self.paths = paths
+        self.interval = interval
+        self.previous = snapshot(paths)
+
+    def wait(self):
+        while True:
+            time.sleep(self.interval)
+            current = snapshot(self.paths)
+            changed = changed_paths(self.previous, current)
+            self.previous = current
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    # Watches every directory under the directories in paths, and the
+    # parent directory of each file in paths (files themselves are often
+    # replaced by a rename on save, which would end a watch on them).
+    def __init__(self, paths, interval):
+        self.interval = interval
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # watch descriptor -> (directory, names of interest or None for all)
+        self.watches = {}
+        try:
+            for path in paths:
+                if os.path.isdir(path):
+                    self.watch_tree(path)
+                else:
+                    self.watch(os.path.dirname(path) or ".", {os.path.basename(path)})
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def watch(self, directory, names=None):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            # ENOSPC when fs.inotify.max_user_watches is used up
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+        self.watches[wd] = (directory, names)
+
+    def watch_tree(self, root):
+        for dirpath, _, _ in os.walk(root):
+            self.watch(dirpath)
+
+    def read_events(self):
+        # changed paths of the events queued so far, or None (see above)
+        changed = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                name = data[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0")
+                pos += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                watched = self.watches.get(wd)
+                if watched is None or not name:
+                    continue
+                directory, names = watched
+                name = os.fsdecode(name)
+                if names is not None and name not in names:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        try:
+                            self.watch_tree(path)
+                        except OSError:
+                            pass
+                    if mask & (IN_CREATE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                        rescan = True
+                    continue
+                changed.add(path)
+        return None if rescan else changed
+
+    def wait(self):
+        while True:
+            select.select([self.fd], [], [])
+            # editors save in several steps; take them as one change
+            time.sleep(self.interval)
+            changed = self.read_events()
+            if changed is None or changed:
+                return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_watcher(paths, interval):
+    try:
+        return InotifyWatcher(paths, interval)
+    except (OSError, AttributeError, TypeError):
+        # not Linux (no libc, or no inotify_init1 in it), or no watches left
+        return PollingWatcher(paths, interval)